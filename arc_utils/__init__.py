@@ -9,6 +9,7 @@ import sys
 if sys.version_info.major == 3:
     raise Exception("This version of arc_utils only supports Python 2.7")
 else:
+    from arc_utils import cache
     from arc_utils import gdb
     from arc_utils import table
     from arc_utils import mxd
\ No newline at end of file
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+"""result caching for long running sessions
+"""
+from __future__ import print_function, unicode_literals, absolute_import
+
+import copy
+import os
+import sys
+import threading
+from collections import namedtuple, OrderedDict
+
+import arcpy
+
+CacheStats = namedtuple('CacheStats', 'hits misses evictions invalidations entries total_bytes')
+
+
+class ResultCache(object):
+    """ bounded least recently used cache of TableObj method results.
+    Entries are keyed by table path, method and parameters and are dropped
+    when the table's change signal (row count, last edit date, file modified time) moves.
+    Usage: cache = arc_utils.cache.ResultCache()
+           tbl = arc_utils.table.TableObj(path, cache=cache)
+    Checking the change signal costs a GetCount, a listing of the table's files
+    and (with an indexed editor tracking field) a one row query, so a table's signal
+    is reused for signal_ttl seconds. Edits made within that time may not be seen.
+    :param
+        max_entries: maximum number of results held (default = 256)
+        max_bytes: maximum estimated memory used by the results (default = 64MB)
+        signal_ttl: seconds a table's change signal is reused for (default = 5)
+    """
+    def __init__(self, max_entries=256, max_bytes=64 * 1024 * 1024, signal_ttl=5.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.signal_ttl = signal_ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.total_bytes = 0
+        self._entries = OrderedDict()  # key: (signal, value, size)
+        self._signals = {}  # table path: (time checked, signal)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def signal(self, table_path, describe_obj=None):
+        """Return the change signal of a table, reusing one checked within signal_ttl seconds"""
+        import time
+        now = time.time()
+        checked = self._signals.get(table_path)
+        if checked is not None and now - checked[0] < self.signal_ttl:
+            return checked[1]
+        signal = change_signal(table_path, describe_obj)
+        self._signals[table_path] = (now, signal)
+        return signal
+
+    def fetch(self, key, signal, compute):
+        """Return the cached result for key, or call compute() and cache its result.
+        Results of None (failures) are not cached.
+            :param key: hashable key
+            :param signal: change signal of the table, eg from change_signal()
+            :param compute: function returning the result
+            :return a copy of the result
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == signal:
+                    self.hits += 1
+                    # move to the most recently used end
+                    del self._entries[key]
+                    self._entries[key] = entry
+                    return copy.deepcopy(entry[1])
+                self.invalidations += 1
+                self._remove(key)
+            self.misses += 1
+
+        value = compute()
+        if value is not None:
+            self.put(key, signal, value)
+        return value
+
+    def put(self, key, signal, value):
+        """Add a copy of a result to the cache, evicting least recently used results as required"""
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        value = copy.deepcopy(value)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (signal, value, size)
+            self.total_bytes += size
+            while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, path=None):
+        """Drop the cached results for a table path, or all results if no path is supplied"""
+        with self._lock:
+            if path is None:
+                self._signals.clear()
+            else:
+                self._signals.pop(path, None)
+            for key in list(self._entries):
+                if path is None or key[0] == path:
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def clear(self):
+        """Drop all results and reset the counters"""
+        with self._lock:
+            self._entries.clear()
+            self._signals.clear()
+            self.total_bytes = 0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def stats(self):
+        """:return named tuple (hits, misses, evictions, invalidations, entries, total_bytes)"""
+        return CacheStats(self.hits, self.misses, self.evictions, self.invalidations,
+                          len(self._entries), self.total_bytes)
+
+    def _remove(self, key):
+        signal, value, size = self._entries.pop(key)
+        self.total_bytes -= size
+
+
+def change_signal(table_path, describe_obj=None):
+    """Return a value that changes when the table is edited:
+    (row count, last edit date, file modified time).
+    The last edit date is only read when editor tracking is enabled and the
+    last edited date field is indexed, as an unindexed ORDER BY sorts the whole table.
+    The file time is only available for file based workspaces (file gdb, shapefile, folder).
+    GetCount reads the row count from metadata for file geodatabases and shapefiles,
+    enterprise geodatabases count the rows.
+        :param table_path {String}:
+            Path or reference to feature class or table.
+        :param describe_obj:
+            optional arcpy Describe object for the table
+    """
+    if describe_obj is None:
+        describe_obj = arcpy.Describe(table_path)
+    row_count = int(arcpy.GetCount_management(table_path).getOutput(0))
+    last_edit = None
+    edit_field = getattr(describe_obj, 'editedAtFieldName', '')
+    if getattr(describe_obj, 'editorTrackingEnabled', False) and _is_indexed(describe_obj, edit_field):
+        sql_clause = (None, 'ORDER BY {0} DESC'.format(arcpy.AddFieldDelimiters(table_path, edit_field)))
+        with arcpy.da.SearchCursor(table_path, edit_field, sql_clause=sql_clause) as rows:
+            for row in rows:
+                last_edit = row[0]
+                break
+    return row_count, last_edit, _file_mtime(table_path, describe_obj)
+
+
+def _is_indexed(describe_obj, field_name):
+    """True if an attribute index of the table starts with the field"""
+    if not field_name:
+        return False
+    for index in getattr(describe_obj, 'indexes', []):
+        fields = index.fields
+        if fields and fields[0].name.lower() == field_name.lower():
+            return True
+    return False
+
+
+def _file_mtime(table_path, describe_obj=None):
+    """Latest modified time of the files holding a table, or None if not file based.
+    For a file gdb only the table's own a0000000N files are used when they can be found
+    (from the dataset ID), otherwise all files in the gdb. Lock files are ignored as
+    they come and go as cursors are opened."""
+    path = table_path
+    while path and not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            return None
+        path = parent
+    if not path or path.lower().endswith('.sde'):
+        return None
+    if os.path.isdir(path):
+        # a file gdb (or folder) - a table edit updates files within it
+        names = [name for name in os.listdir(path) if not name.lower().endswith('.lock')]
+        dsid = getattr(describe_obj, 'DSID', None)
+        if path.lower().endswith('.gdb') and dsid:
+            prefix = 'a{0:08x}.'.format(dsid)
+            own = [name for name in names if name.lower().startswith(prefix)]
+            if own:
+                names = own
+        names = [os.path.join(path, name) for name in names]
+        return max([os.path.getmtime(name) for name in names] or [os.path.getmtime(path)])
+    stem = os.path.splitext(path)[0]
+    names = [path] + [stem + ext for ext in ('.dbf', '.shx') if os.path.exists(stem + ext)]
+    return max(os.path.getmtime(name) for name in names)
+
+
+def _sizeof(value, depth=0):
+    """Estimate the memory used by a result and its contents"""
+    size = sys.getsizeof(value)
+    if depth > 3:
+        return size
+    if isinstance(value, dict):
+        size += sum(_sizeof(k, depth + 1) + _sizeof(v, depth + 1) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(_sizeof(v, depth + 1) for v in value)
+    return size
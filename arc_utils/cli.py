@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""command line runner for batches of arc_utils operations read from a JSON job file.
+Usage: arc_utils jobs.json --output results.json
+The job file lists operations:
+    {"operations": [
+        {"op": "value_set", "table": path, "field": "Field1"},
+        {"op": "max", "table": path, "field": "Field1"},
+        {"op": "longest", "table": path, "field": "Field1"},
+        {"op": "max_length", "table": path, "field": "Field1"},
+        {"op": "duplicates", "table": path, "field": "Field1"},
+        {"op": "domain_check", "table": path, "field": "Field1", "gdb": path, "domain": "Domain1"},
+        {"op": "schema_diff", "table": path, "other": path},
+        {"op": "field_report", "table": path, "output": folder},
+        {"op": "gdb_report", "gdb": path, "output": file},
+        {"op": "export_domains", "gdb": path, "workspace": path}
+    ]}
+All value operations on a table share one cursor pass, and each table is described once.
+Operations that write output keep their place in the file order (see plan_jobs).
+"""
+from __future__ import print_function, unicode_literals, absolute_import
+
+import json
+import sys
+import time
+from collections import OrderedDict
+
+from . import gdb
+from . import table
+from .output import json_ready
+from .output import output_msg
+
+# operation: statistic read by the shared cursor pass
+_SCAN_OPERATIONS = {"value_set": "value_set", "max": "max", "longest": "longest", "max_length": "max_length",
+                    "duplicates": "duplicates", "domain_check": "value_set"}
+_TABLE_OPERATIONS = ("schema_diff", "field_report")
+_GDB_OPERATIONS = ("gdb_report", "export_domains")
+_WRITE_OPERATIONS = ("field_report", "gdb_report", "export_domains")
+_REQUIRED = {"domain_check": ("table", "field", "gdb", "domain"), "schema_diff": ("table", "other"),
+             "field_report": ("table", "output"), "gdb_report": ("gdb",), "export_domains": ("gdb",)}
+
+
+def plan_jobs(operations):
+    """Group operations into steps. Value operations are grouped by table into one
+    'scan' step per table, followed by the schema_diff operations, in their original order.
+    Operations that write output (field_report, gdb_report, export_domains) are barriers:
+    the operations before one are run before it and those after it after it, so a scan
+    never moves across a step that may change what it reads.
+    :param operations {array of dictionaries}:
+        operations from a job file
+    :return (steps, errors). steps is a list of (kind, name, [(index, operation)]),
+        errors a dictionary of index: message for invalid operations
+    """
+    steps = []
+    scans = OrderedDict()
+    others = []
+    errors = {}
+    for index, operation in enumerate(operations):
+        op = operation.get("op")
+        required = _REQUIRED.get(op, ("table", "field"))
+        missing = [key for key in required if key not in operation]
+        if op not in _SCAN_OPERATIONS and op not in _TABLE_OPERATIONS and op not in _GDB_OPERATIONS:
+            errors[index] = "Unknown operation {0}".format(op)
+        elif missing:
+            errors[index] = "{0} requires {1}".format(op, ", ".join(missing))
+        elif op in _SCAN_OPERATIONS:
+            scans.setdefault(operation["table"], []).append((index, operation))
+        elif op in _WRITE_OPERATIONS:
+            steps += [("scan", path, ops) for path, ops in scans.items()] + others
+            steps.append((op, operation.get("table") or operation.get("gdb"), [(index, operation)]))
+            scans = OrderedDict()
+            others = []
+        else:
+            others.append((op, operation.get("table") or operation.get("gdb"), [(index, operation)]))
+    steps += [("scan", path, ops) for path, ops in scans.items()] + others
+    return steps, errors
+
+
+class JobRunner(object):
+    """ runs a planned job, keeping one TableObj per table for all of its operations
+    :param
+        operations: list of operation dictionaries
+        progress: report each step and its time (default = True)
+    """
+    def __init__(self, operations, progress=True):
+        self.operations = operations
+        self.progress = progress
+        self.steps, self.errors = plan_jobs(operations)
+        self.results = [None] * len(operations)
+        self._tables = {}
+
+    def table(self, path):
+        if path not in self._tables:
+            self._tables[path] = table.TableObj(path)
+        return self._tables[path]
+
+    def run(self):
+        """Run every step. :return list of result dictionaries in the order of the operations"""
+        start = time.time()
+        for index, message in self.errors.items():
+            self._record(index, None, message, 0)
+        scans = sum(1 for step in self.steps if step[0] == "scan")
+        self._msg("{0} operations planned as {1} steps ({2} table scans)".format(
+            len(self.operations), len(self.steps), scans))
+        for number, (kind, name, operations) in enumerate(self.steps, 1):
+            step_start = time.time()
+            try:
+                if kind == "scan":
+                    self._scan(name, operations)
+                else:
+                    self._other(kind, operations[0])
+            except Exception as e:
+                for index, operation in operations:
+                    self._record(index, None, "{0}: {1}".format(type(e).__name__, e), time.time() - step_start)
+            self._msg("[{0}/{1}] {2} {3}: {4} operations in {5:.2f}s".format(
+                number, len(self.steps), kind, name, len(operations), time.time() - step_start))
+        failed = sum(1 for result in self.results if result["error"])
+        self._msg("Completed {0} operations ({1} failed) in {2:.2f}s".format(
+            len(self.results), failed, time.time() - start))
+        return self.results
+
+    def _scan(self, path, operations):
+        """Run the value operations on a table from one cursor pass"""
+        step_start = time.time()
+        tbl = self.table(path)
+        statistics = sorted(set((_SCAN_OPERATIONS[o["op"]], o["field"]) for i, o in operations))
+        values = tbl.get_field_statistics(statistics)
+        for index, operation in operations:
+            key = (_SCAN_OPERATIONS[operation["op"]], operation["field"])
+            try:
+                result = values[key]
+                if operation["op"] == "domain_check":
+                    result = tbl.compare_field_values_to_domain(operation["field"], operation["gdb"],
+                                                                operation["domain"], field_values=result)
+                self._record(index, result, None, time.time() - step_start)
+            except Exception as e:
+                self._record(index, None, "{0}: {1}".format(type(e).__name__, e), time.time() - step_start)
+
+    def _other(self, kind, index_operation):
+        """Run a schema, report or domain operation"""
+        step_start = time.time()
+        index, operation = index_operation
+        if kind == "schema_diff":
+            result = table.compare_schema(self.table(operation["table"]), self.table(operation["other"]))
+        elif kind == "field_report":
+            result = self.table(operation["table"]).export_schema_to_csv(operation["output"])
+        elif kind == "gdb_report":
+            result = gdb.report_all_fc_as_text(operation["gdb"], operation.get("output"), operation.get("sep", '\t'))
+        else:
+            result = gdb.export_all_domains(operation["gdb"], operation.get("workspace"))
+        self._record(index, result, None, time.time() - step_start)
+
+    def _record(self, index, result, error, seconds):
+        self.results[index] = {"operation": self.operations[index], "result": result,
+                               "error": error, "seconds": seconds}
+
+    def _msg(self, message):
+        if self.progress:
+            output_msg(message)
+
+
+def main(argv=None):
+    """console entry point"""
+    import argparse
+    parser = argparse.ArgumentParser(description="Run a JSON job file of arc_utils operations")
+    parser.add_argument("job_file", help="JSON file with a list of operations")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file (default = print)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="don't report progress")
+    args = parser.parse_args(argv)
+
+    with open(args.job_file) as f:
+        job = json.load(f)
+    operations = job["operations"] if isinstance(job, dict) else job
+    results = JobRunner(operations, progress=not args.quiet).run()
+    text = json.dumps(json_ready(results), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text)
+    else:
+        print(text)
+    return 1 if any(result["error"] for result in results) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -123,4 +123,137 @@ def import_tables_as_domains(tables, geodatabase):
         output_msg(str(e.args[0]))
         output_msg(arcpy.GetMessages())
     finally:
-        output_msg("Completed")
\ No newline at end of file
+        output_msg("Completed")
+
+
+class FieldRecord(object):
+    """ compact record of a field's properties, with the same attribute names as arcpy Field objects.
+    editable, isNullable and required are held as bit flags.
+    """
+    __slots__ = ('table', 'name', 'baseName', 'aliasName', 'type', 'length', 'precision', 'scale',
+                 'domain', 'defaultValue', '_flags')
+
+    _EDITABLE, _NULLABLE, _REQUIRED = 1, 2, 4
+
+    def __init__(self, table, name, baseName, aliasName, type, length, precision, scale,
+                 domain, defaultValue, editable, isNullable, required):
+        self.table = table
+        self.name = name
+        self.baseName = baseName
+        self.aliasName = aliasName
+        self.type = type
+        self.length = length
+        self.precision = precision
+        self.scale = scale
+        self.domain = domain
+        self.defaultValue = defaultValue
+        self._flags = ((self._EDITABLE if editable else 0) | (self._NULLABLE if isNullable else 0) |
+                       (self._REQUIRED if required else 0))
+
+    @property
+    def editable(self):
+        return bool(self._flags & self._EDITABLE)
+
+    @property
+    def isNullable(self):
+        return bool(self._flags & self._NULLABLE)
+
+    @property
+    def required(self):
+        return bool(self._flags & self._REQUIRED)
+
+    def as_dict(self):
+        """:return dictionary of properties in the format of TableObj.field_dict values"""
+        return dict((att, getattr(self, att)) for att in _FIELD_ATTRIBUTES)
+
+    def __repr__(self):
+        return "FieldRecord({0!r}, {1!r}, {2!r})".format(self.table, self.name, self.type)
+
+
+_FIELD_ATTRIBUTES = ('name', 'baseName', 'aliasName', 'type', 'length', 'precision', 'scale',
+                     'domain', 'defaultValue', 'editable', 'isNullable', 'required')
+
+
+class GdbCatalog(object):
+    """ catalog of every field of every featureclass and table in a geodatabase,
+    read in one walk of the geodatabase. Fields are held as compact FieldRecords
+    and indexed by name, domain and type so lookups don't need another walk.
+    Table names include the feature dataset (eg 'dataset/featureclass').
+    Usage: cat = arc_utils.gdb.GdbCatalog(path)
+           cat.tables_with_field('PARCEL_ID')
+    :param
+        geodatabase: path or reference to a geodatabase
+    """
+    def __init__(self, geodatabase):
+        self.geodatabase = geodatabase
+        self.tables = []  # table names in walk order
+        self.records = []  # FieldRecords, grouped by table
+        self.domains = sorted(d.name for d in arcpy.da.ListDomains(geodatabase))
+        self._strings = {}
+        self._by_table = {}
+        self._by_name = {}
+        self._by_domain = {}
+        self._by_type = {}
+        self._load()
+
+    def _intern(self, value):
+        """share one copy of repeated strings (field names, types, domains)"""
+        return self._strings.setdefault(value, value)
+
+    def _load(self):
+        import array
+        for dirpath, dirnames, filenames in arcpy.da.Walk(self.geodatabase, datatype=['FeatureClass', 'Table']):
+            dataset = os.path.relpath(dirpath, self.geodatabase)
+            for name in filenames:
+                table = name if dataset == '.' else "{0}/{1}".format(dataset.replace(os.sep, '/'), name)
+                try:
+                    fields = arcpy.ListFields(os.path.join(dirpath, name))
+                except Exception as e:
+                    output_msg(str(e.args[0]))
+                    output_msg(arcpy.GetMessages())
+                    continue
+                table = self._intern(table)
+                self.tables.append(table)
+                self._by_table[table] = (len(self.records), len(self.records) + len(fields))
+                for field in fields:
+                    i = len(self.records)
+                    record = FieldRecord(table, self._intern(field.name), self._intern(field.baseName),
+                                         self._intern(field.aliasName), self._intern(field.type),
+                                         field.length, field.precision, field.scale,
+                                         self._intern(field.domain), field.defaultValue,
+                                         field.editable, field.isNullable, field.required)
+                    self.records.append(record)
+                    self._by_name.setdefault(record.name.lower(), array.array(str('l'))).append(i)
+                    self._by_type.setdefault(record.type, array.array(str('l'))).append(i)
+                    if record.domain:
+                        self._by_domain.setdefault(record.domain, array.array(str('l'))).append(i)
+        self._strings = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def fields(self, table):
+        """:return list of FieldRecords for a table"""
+        start, end = self._by_table[table]
+        return self.records[start:end]
+
+    def field_dict(self, table):
+        """:return dictionary of a table's fields in the format of TableObj.field_dict"""
+        return dict((record.name, record.as_dict()) for record in self.fields(table))
+
+    def tables_with_field(self, field_name):
+        """:return list of tables with a field of this name (not case sensitive)"""
+        return [self.records[i].table for i in self._by_name.get(field_name.lower(), [])]
+
+    def fields_with_domain(self, domain_name):
+        """:return list of FieldRecords using a domain"""
+        return [self.records[i] for i in self._by_domain.get(domain_name, [])]
+
+    def fields_of_type(self, field_type):
+        """:return list of FieldRecords of a field type (eg 'String', 'Double')"""
+        return [self.records[i] for i in self._by_type.get(field_type, [])]
+
+    def unused_domains(self):
+        """:return list of domains not assigned to any field.
+        Domains only assigned to subtypes are included."""
+        return [d for d in self.domains if d not in self._by_domain]
@@ -3,6 +3,7 @@
 """
 from __future__ import print_function, unicode_literals, absolute_import
 import arcpy
+import datetime
 import os
 
 def output_msg(msg, severity=0):
@@ -77,4 +78,30 @@ def output_to_file(data, path, filename):
     path = get_valid_output_path(path)
     output_file = os.path.join(path, filename)
     with open(output_file, "w") as output:
-        output_file.write('{}').format(data)
\ No newline at end of file
+        output_file.write('{}').format(data)
+
+
+def json_ready(value):
+    """Convert a result to JSON compatible values.
+    Named tuples become objects, sets sorted lists and dictionary keys strings."""
+    if hasattr(value, '_asdict'):
+        return dict((k, json_ready(v)) for k, v in value._asdict().items())
+    if isinstance(value, dict):
+        return dict((k if isinstance(k, (str, type(''))) else repr(k), json_ready(v)) for k, v in value.items())
+    if isinstance(value, (set, frozenset)):
+        try:
+            value = sorted(value)
+        except TypeError:
+            value = list(value)
+        return [json_ready(v) for v in value]
+    if isinstance(value, (list, tuple)):
+        return [json_ready(v) for v in value]
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, 'tolist'):
+        # numpy arrays and numbers
+        return value.tolist()
+    if hasattr(value, '__slots__') and hasattr(value, 'as_dict'):
+        # gdb.FieldRecord
+        return dict(value.as_dict(), table=value.table)
+    return value
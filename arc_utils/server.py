@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""local query server that keeps arcpy and table metadata loaded between jobs,
+and a client for it.
+Start the server with: python -m arc_utils.server --port 7862
+Requests and responses are single lines of JSON:
+    {"method": "table.get_field_value_set", "params": {"table": path, "field": "Field1"}, "token": null}
+    {"result": [...], "error": null}
+"""
+from __future__ import print_function, unicode_literals, absolute_import
+
+import json
+import socket
+import threading
+import time
+try:
+    import SocketServer as socketserver
+    import Queue as queue
+except ImportError:
+    import socketserver
+    import queue
+
+import arcpy
+from . import gdb
+from . import table
+from .cache import ResultCache
+from .output import json_ready
+from .output import output_msg
+
+DEFAULT_PORT = 7862
+
+# TableObj methods available as table.<method>
+_TABLE_METHODS = table._FIELD_STATISTICS + table._TABLE_STATISTICS + (
+    "get_multiple_field_value_set", "compare_field_values_to_domain", "right_size_schema", "export_schema_to_csv")
+# GdbCatalog methods available as catalog.<method>
+_CATALOG_METHODS = ("tables_with_field", "fields_with_domain", "fields_of_type", "unused_domains", "field_dict")
+_FUNCTIONS = {
+    "gdb.report_all_fc_as_text": gdb.report_all_fc_as_text,
+    "gdb.export_all_domains": gdb.export_all_domains,
+}
+# methods writing to paths chosen by the client, only available when the server has a token
+_WRITE_METHODS = ("table.export_schema_to_csv", "table.right_size_schema",
+                  "gdb.report_all_fc_as_text", "gdb.export_all_domains")
+
+
+class QueryError(Exception):
+    """Error returned by the query server"""
+
+
+class QueryServer(object):
+    """ long running server answering TableObj statistic, compare_schema, catalog and
+    gdb report requests. TableObjs (Describe and field metadata), GdbCatalogs and
+    statistic results are kept between requests. Before a kept TableObj is used the
+    table's fields are listed and compared, and before a kept GdbCatalog is used the
+    modified time of a file gdb's item table is checked. Catalogs of other workspaces
+    are kept until invalidated (server.invalidate).
+    arcpy is not thread safe under Python 2.7, so connections are read on their own
+    threads but every request is run in turn on a single arcpy thread. A long request
+    delays the requests queued behind it; run more servers (processes) to work in parallel.
+    Usage: arc_utils.server.QueryServer().serve_forever()
+    :param
+        host: address to listen on (default = '127.0.0.1', local connections only)
+        port: port to listen on (default = 7862)
+        cache: ResultCache for statistic results (default = a new ResultCache)
+        token: shared secret every request must include. Required when listening on
+            anything other than a loopback address. Methods that write files (report
+            and export methods) are refused unless the server has a token, as any
+            local user could otherwise write files as the server's user.
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, cache=None, token=None):
+        if not token and not _is_loopback(host):
+            raise ValueError("A token is required to listen on {0}".format(host))
+        self.token = token
+        self.cache = cache if cache is not None else ResultCache()
+        self.started = time.time()
+        self.requests = 0
+        self._tables = {}
+        self._catalogs = {}
+        self._lock = threading.Lock()
+        self.server = _QueuedTCPServer((host, port), _RequestHandler)
+        self.server.query_server = self
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def serve_forever(self):
+        output_msg("Serving on {0}:{1}".format(*self.address))
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def table(self, path):
+        """Return the kept TableObj for a path, describing the table again if its fields have changed"""
+        signature = _field_signature(path)
+        with self._lock:
+            kept = self._tables.get(path)
+            if kept is None or kept[0] != signature:
+                kept = self._tables[path] = (signature, table.TableObj(path, cache=self.cache))
+            return kept[1]
+
+    def catalog(self, geodatabase):
+        """Return the kept GdbCatalog for a geodatabase, reading it again if its schema has changed"""
+        signature = _schema_signature(geodatabase)
+        with self._lock:
+            kept = self._catalogs.get(geodatabase)
+            if kept is None or kept[0] != signature:
+                kept = self._catalogs[geodatabase] = (signature, gdb.GdbCatalog(geodatabase))
+            return kept[1]
+
+    def invalidate(self, path=None):
+        """Drop the kept metadata and results for a table or geodatabase path, or everything"""
+        with self._lock:
+            for kept in (self._tables, self._catalogs):
+                for key in list(kept):
+                    if path is None or key == path:
+                        del kept[key]
+        self.cache.invalidate(path)
+
+    def check_token(self, token):
+        """Raise QueryError unless the token matches the server's token"""
+        import hmac
+        # compared as JSON, which is ascii text under python 2 and 3
+        if self.token and not hmac.compare_digest(json.dumps(token), json.dumps(self.token)):
+            raise QueryError("Invalid token")
+
+    def dispatch(self, method, params):
+        """Run a request and return its result"""
+        self.requests += 1
+        params = dict(params or {})
+        if method in _WRITE_METHODS and not self.token:
+            raise QueryError("{0} writes files and is only available when the server has a token".format(method))
+        if method.startswith("table."):
+            name = method[len("table."):]
+            if name == "field_dict":
+                return self.table(params["table"]).field_dict
+            if name not in _TABLE_METHODS:
+                raise QueryError("Unknown method {0}".format(method))
+            tbl = self.table(params.pop("table"))
+            if "sample" in params:
+                params["sample"] = table.Sample(**params["sample"])
+            return getattr(tbl, name)(**params)
+        if method.startswith("catalog."):
+            name = method[len("catalog."):]
+            if name not in _CATALOG_METHODS:
+                raise QueryError("Unknown method {0}".format(method))
+            catalog = self.catalog(params.pop("geodatabase"))
+            return getattr(catalog, name)(**params)
+        if method == "compare_schema":
+            return table.compare_schema(self.table(params["fc1"]), self.table(params["fc2"]))
+        if method == "server.stats":
+            return {"requests": self.requests, "uptime": time.time() - self.started,
+                    "tables": len(self._tables), "catalogs": len(self._catalogs), "cache": self.cache.stats()}
+        if method == "server.invalidate":
+            return self.invalidate(params.get("path"))
+        if method in _FUNCTIONS:
+            return _FUNCTIONS[method](**params)
+        raise QueryError("Unknown method {0}".format(method))
+
+
+def _is_loopback(host):
+    return host in ('localhost', '::1') or host.startswith('127.')
+
+
+def _field_signature(path):
+    """Name, type, length and domain of each field of a table"""
+    return tuple((f.name, f.type, f.length, f.domain) for f in arcpy.ListFields(path))
+
+
+def _schema_signature(geodatabase):
+    """Modified time of a file gdb's GDB_Items table (a00000004), which is updated when
+    datasets, fields or domains change. None for other workspaces."""
+    import os
+    items = os.path.join(geodatabase, 'a00000004.gdbtable')
+    if not os.path.exists(items):
+        return None
+    return os.path.getmtime(items)
+
+
+class _QueuedTCPServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    """TCPServer reading each connection on its own thread and queueing the requests
+    for a single worker thread, the only thread that calls arcpy"""
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, server_address, handler_class):
+        socketserver.TCPServer.__init__(self, server_address, handler_class)
+        self._requests = queue.Queue()
+        worker = threading.Thread(target=self._work)
+        worker.daemon = True
+        worker.start()
+
+    def submit(self, line):
+        """Queue a request line for the worker and wait for its response"""
+        reply = queue.Queue(1)
+        self._requests.put((line, reply))
+        return reply.get()
+
+    def _work(self):
+        while True:
+            line, reply = self._requests.get()
+            reply.put(self._respond(line))
+
+    def _respond(self, line):
+        start = time.time()
+        try:
+            request = json.loads(line.decode('utf-8'))
+            self.query_server.check_token(request.get("token"))
+            result = self.query_server.dispatch(request["method"], request.get("params"))
+            response = {"result": json_ready(result), "error": None}
+        except arcpy.ExecuteError as e:
+            response = {"result": None, "error": "{0}: {1}\n{2}".format(type(e).__name__, e, arcpy.GetMessages(2))}
+        except Exception as e:
+            response = {"result": None, "error": "{0}: {1}".format(type(e).__name__, e)}
+        response["seconds"] = time.time() - start
+        return response
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answers each line of JSON on a connection with a line of JSON"""
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            if not line.strip():
+                continue
+            response = self.server.submit(line)
+            self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+            self.wfile.flush()
+
+
+class QueryClient(object):
+    """ client for a QueryServer. The connection is kept open between calls.
+    Usage: with arc_utils.server.QueryClient() as client:
+               values = client.call('table.get_field_value_set', table=path, field='Field1')
+    :param
+        host: server address (default = '127.0.0.1')
+        port: server port (default = 7862)
+        timeout: seconds to wait for a response (default = None, wait forever)
+        token: the server's token, if it has one
+    """
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, timeout=None, token=None):
+        self.address = (host, port)
+        self.timeout = timeout
+        self.token = token
+        self._socket = None
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def connect(self):
+        self._socket = socket.create_connection(self.address, self.timeout)
+        self._file = self._socket.makefile('rwb')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._socket.close()
+        self._file = None
+        self._socket = None
+
+    def call(self, method, **params):
+        """Send a request and return its result. Raises QueryError if the request failed."""
+        if self._file is None:
+            self.connect()
+        request = json.dumps({"method": method, "params": params, "token": self.token})
+        self._file.write(request.encode('utf-8') + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            self.close()
+            raise QueryError("Connection closed by server")
+        response = json.loads(line.decode('utf-8'))
+        if response["error"]:
+            raise QueryError(response["error"])
+        return response["result"]
+
+
+def main(argv=None):
+    import argparse
+    import os
+    parser = argparse.ArgumentParser(description="arc_utils query server")
+    parser.add_argument("--host", default='127.0.0.1',
+                        help="address to listen on, a token is required for non loopback addresses")
+    parser.add_argument("--token", default=os.environ.get('ARC_UTILS_TOKEN'),
+                        help="shared secret clients must send (default = ARC_UTILS_TOKEN environment variable)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--max-entries", type=int, default=256, help="result cache entries")
+    args = parser.parse_args(argv)
+    QueryServer(args.host, args.port, ResultCache(max_entries=args.max_entries), args.token).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,22 +3,132 @@
 """
 from __future__ import print_function, unicode_literals, absolute_import
 
+from collections import namedtuple
+
 import arcpy
 from .output import get_valid_output_path
 from .output import output_msg
 
+GeometryStats = namedtuple('GeometryStats', 'count null_count empty_count extent area length vertex_count heaviest')
+Distribution = namedtuple('Distribution', 'min max mean std percentiles')
+
+SchemaAdvice = namedtuple('SchemaAdvice', 'report row_count changes bytes_saved')
+FieldChange = namedtuple('FieldChange', 'field old_type new_type old_length new_length precision scale bytes_saved')
+
+AnalysisJob = namedtuple('AnalysisJob', 'table fields statistics')
+JobResult = namedtuple('JobResult', 'job results error seconds')
+LoadResult = namedtuple('LoadResult', 'rows_read rows_loaded rows_rejected seconds rows_per_second rejected_rows')
+IntegrityResult = namedtuple('IntegrityResult', 'child_rows null_keys orphan_rows orphans sample_oids spilled')
+DataDiff = namedtuple('DataDiff', 'inserted deleted modified')
+SampleEstimate = namedtuple('SampleEstimate', 'value rows_read total_rows fraction estimates')
+
+_PERCENTILES = (5, 25, 50, 75, 95)
+
+# convert reported types to types accepted by add field tool
+_TYPE_CONVERSIONS = {"String": "TEXT", "Single": "FLOAT", "Float": "FLOAT", "Double": "DOUBLE",
+                     "SmallInteger": "SHORT", "Integer": "LONG", "Date": "DATE", "Blob": "BLOB",
+                     "Raster": "RASTER", "GUID": "GUID", "TRUE": "True", "FALSE": "False"}
+# storage in bytes per value of fixed size field types
+_TYPE_SIZES = {"SmallInteger": 2, "Integer": 4, "Single": 4, "Double": 8}
+_TYPE_RANGES = {"SmallInteger": (-32768, 32767), "Integer": (-2147483648, 2147483647)}
+_MEASURED_TYPES = ("String", "SmallInteger", "Integer", "Single", "Double")
+# TableObj methods available to analyze_tables
+_FIELD_STATISTICS = ("get_max_field_value", "get_max_field_value_length", "get_field_value_set",
+                     "find_duplicate_field_values")
+_TABLE_STATISTICS = ("get_geometry_stats", "find_spatial_duplicates")
+# statistics that print errors and return None unless raise_errors is set
+_RAISING_STATISTICS = ("get_field_value_set", "find_duplicate_field_values")
+
+
+class Sample(object):
+    """ describes a sample of a table for the TableObj statistic methods.
+    The OID range of the table is split into pages of page_size OIDs and
+    a fraction of the pages are read using OID range where clauses.
+    This is a cluster sample: rows in a page were usually loaded together and are
+    alike, so the confidence bounds of the statistic methods count each page read
+    (that holds rows) as one draw, rather than each row.
+    Usage: tbl.get_field_value_set('field', sample=arc_utils.table.Sample(0.01))
+    :param
+        fraction: fraction of pages to read (default = 0.01)
+        method: 'systematic' (evenly spaced pages, default) or 'random'
+        page_size: number of OIDs in each page (default = 1000)
+        seed: random seed, for a repeatable sample
+    """
+    def __init__(self, fraction=0.01, method='systematic', page_size=1000, seed=None):
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be greater than 0 and no more than 1")
+        if method not in ('systematic', 'random'):
+            raise ValueError("method must be 'systematic' or 'random'")
+        self.fraction = fraction
+        self.method = method
+        self.page_size = int(page_size)
+        self.seed = seed
+
+    @property
+    def cacheable(self):
+        """True if the sample reads the same pages each time (a seed is set)"""
+        return self.seed is not None
+
+    def __repr__(self):
+        return "Sample({0!r}, {1!r}, {2!r}, {3!r})".format(self.fraction, self.method, self.page_size, self.seed)
+
+    def pages(self, page_count):
+        """Return the sorted page numbers to read out of page_count pages"""
+        import math
+        import random
+        rand = random.Random(self.seed)
+        n = min(page_count, max(1, int(math.ceil(page_count * self.fraction))))
+        if self.method == 'random':
+            return sorted(rand.sample(range(page_count), n))
+        step = float(page_count) / n
+        offset = rand.random() * step
+        return [int(offset + k * step) for k in range(n)]
+
+    def where_clauses(self, tbl):
+        """Yield an OID range where clause for each page of the sample
+        :param tbl {TableObj}:
+            the table to sample
+        """
+        low, high = tbl._oid_range()
+        if high < low:
+            return
+        oid_field = arcpy.AddFieldDelimiters(tbl.path, tbl.describe_obj.OIDFieldName)
+        page_count = (high - low) // self.page_size + 1
+        for page in self.pages(page_count):
+            start = low + page * self.page_size
+            yield "{0} >= {1} AND {0} < {2}".format(oid_field, start, start + self.page_size)
+
+
+def _cached(method):
+    """Decorator for TableObj statistic methods.
+    If the TableObj has a cache the result is fetched from (or added to) it."""
+    import functools
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        params = list(args) + list(kwargs.values())
+        if self.cache is None or not all(getattr(p, 'cacheable', True) for p in params):
+            return method(self, *args, **kwargs)
+        key = (self.path, method.__name__, repr(args), repr(sorted(kwargs.items())))
+        signal = self.cache.signal(self.path, self.describe_obj)
+        return self.cache.fetch(key, signal, lambda: method(self, *args, **kwargs))
+    return wrapper
+
 
 class TableObj(object):
     """ provide properties for working with a table/featureclass
     Usage: tbl = arc_utils.table.TableObj(path)
     :param
         path: a string representing an table/featureclass
+        cache: optional arc_utils.cache.ResultCache. If supplied the results of
+            the statistic methods are cached until the table changes.
     """
-    def __init__(self, table_path):
+    def __init__(self, table_path, cache=None):
         """ sets up reference to table
         adds properties and methods
         """
         self.path = table_path
+        self.cache = cache
         self.describe_obj = self._describe_object()
         self.name = self._get_fc_name()
         self.type = self._get_fc_type()
@@ -84,79 +194,165 @@ class TableObj(object):
         str_output += "\n"
         return str_output
 
-    def get_max_field_value(self, field, lengthcomp=False):
+    def _search_rows(self, fields, sample=None):
+        """Yield rows from a SearchCursor over the whole table,
+        or over each OID page of a Sample.
+        """
+        if sample is None:
+            with arcpy.da.SearchCursor(self.path, fields) as rows:
+                for row in rows:
+                    yield row
+        else:
+            for where_clause in sample.where_clauses(self):
+                with arcpy.da.SearchCursor(self.path, fields, where_clause) as rows:
+                    for row in rows:
+                        yield row
+
+    def _search_pages(self, fields, sample):
+        """Yield the rows of each OID page of a Sample as a list, skipping pages without rows"""
+        for where_clause in sample.where_clauses(self):
+            with arcpy.da.SearchCursor(self.path, fields, where_clause) as rows:
+                page = list(rows)
+            if page:
+                yield page
+
+    def _row_count(self):
+        """Number of rows in the table"""
+        return int(arcpy.GetCount_management(self.path).getOutput(0))
+
+    def _oid_range(self):
+        """Return the (lowest, highest) OID in the table"""
+        if not getattr(self.describe_obj, 'hasOID', False):
+            raise ValueError("{0} does not have an OID field and cannot be sampled".format(self.name))
+        if getattr(self.describe_obj, 'dataType', None) == 'ShapeFile':
+            return 0, self._row_count() - 1
+        oid_field = arcpy.AddFieldDelimiters(self.path, self.describe_obj.OIDFieldName)
+        oid_range = []
+        for order in ('ASC', 'DESC'):
+            sql_clause = (None, 'ORDER BY {0} {1}'.format(oid_field, order))
+            with arcpy.da.SearchCursor(self.path, 'OID@', sql_clause=sql_clause) as rows:
+                for row in rows:
+                    oid_range.append(row[0])
+                    break
+        if not oid_range:
+            return 0, -1
+        return min(oid_range), max(oid_range)
+
+    def _sample_result(self, value, rows_read, estimates):
+        """Wrap the result of a sampled statistic in a SampleEstimate"""
+        total_rows = self._row_count()
+        fraction = float(rows_read) / total_rows if total_rows else 1.0
+        return SampleEstimate(value, rows_read, total_rows, fraction, estimates)
+
+    @_cached
+    def get_max_field_value(self, field, lengthcomp=False, sample=None):
         """Return the largest value (if numeric).
         lexicographic string comparison is used to determine largest value for strings by default.
             :param {String} field:
             name of the field to parse
             :param {Boolean} lengthcomp:
             If True will compare strings for length rather than lexicographically (ascii value of letters)
+            :param {Sample} sample:
+            If supplied only the sample is read and a SampleEstimate is returned.
+            estimates['above_max_rate_95']: with 95% confidence fewer than this fraction of rows are larger
+            (the bound for the fraction of pages holding a larger value, from estimates['pages_read'] pages).
         """
         field_type = self.field_dict[field]['type']
         if field_type in ["Geometry"]:
             print("Cannot process Geometry field")
             return None
-        elif field_type in ["String"]:
-            result = ''
-        else:
-            result = 0
-        with arcpy.da.SearchCursor(self.path, field) as values:
-            for value in values:
-                if value[0] is not None:
-                    val = value[0]
-                    if field_type in ["String"] and lengthcomp:
-                        if len(val) > len(result):
-                            result = val
-                    else:
-                        if val > result:
-                            result = val
-        return result
+        accumulator = _MaxAccumulator(self.field_dict[field], lengthcomp=lengthcomp)
+        rows_read, pages_read = self._accumulate(field, accumulator, sample)
+        if sample is not None:
+            return self._sample_result(accumulator.result, rows_read,
+                                       {'above_max_rate_95': _upper_rate_95(0, pages_read),
+                                        'pages_read': pages_read})
+        return accumulator.result
 
-    def get_max_field_value_length(self, field):
+    @_cached
+    def get_max_field_value_length(self, field, sample=None):
         """Return the length of the maximum value in the field.
             :param: field {String}:
             name of the field to parse
+            :param {Sample} sample:
+            If supplied only the sample is read and a SampleEstimate is returned.
+            estimates['above_max_rate_95']: with 95% confidence fewer than this fraction of rows are longer
+            (the bound for the fraction of pages holding a longer value, from estimates['pages_read'] pages).
         """
-        length = 0
-        with arcpy.da.SearchCursor(self.path, field) as values:
-            for value in values:
-                if value[0] is not None:
-                    val = str(value[0])
-                    if len(val) > length:
-                        length = len(val)
-        return length
+        accumulator = _MaxLengthAccumulator(self.field_dict[field])
+        rows_read, pages_read = self._accumulate(field, accumulator, sample)
+        if sample is not None:
+            return self._sample_result(accumulator.result, rows_read,
+                                       {'above_max_rate_95': _upper_rate_95(0, pages_read),
+                                        'pages_read': pages_read})
+        return accumulator.result
+
+    def _accumulate(self, field, accumulator, sample=None):
+        """Add the values of a field (or of a sample) to an accumulator.
+        :return (rows read, pages read). Only sample pages holding rows are counted."""
+        rows_read = 0
+        pages_read = 0
+        add = accumulator.add
+        if sample is None:
+            for row in self._search_rows(field):
+                rows_read += 1
+                add(row[0])
+            return rows_read, pages_read
+        end_page = getattr(accumulator, 'end_page', None)
+        for page in self._search_pages(field, sample):
+            rows_read += len(page)
+            pages_read += 1
+            for row in page:
+                add(row[0])
+            if end_page is not None:
+                end_page()
+        return rows_read, pages_read
 
-    def get_field_value_set(self, field, charset='ascii'):
+    def _sample_value_counts(self, field, sample, charset='ascii'):
+        """Return a Counter of the field values in a sample, a list of the sets of
+        values in each page read and the number of rows read.
+        Values are converted as per get_field_value_set."""
+        accumulator = _ValueSetAccumulator(self.field_dict[field], charset, counted=True)
+        rows_read, pages_read = self._accumulate(field, accumulator, sample)
+        return accumulator.counts, accumulator.pages, rows_read
+
+    @_cached
+    def get_field_value_set(self, field, charset='ascii', sample=None, raise_errors=False):
         """Return set of unique field values
             :param field {String}:
                 name of the field to parse
             :param: charset {String}:
                 character set to use (default = 'ascii').
                 Valid values are those in the Python documentation for string encode.
+            :param sample {Sample}:
+                If supplied only the sample is read and a SampleEstimate is returned.
+                The estimates use the number of pages each value was found in (of estimates['pages_read']):
+                estimates['distinct_estimate']: estimated number of unique values in the table (Chao2)
+                estimates['unseen_rate']: estimated fraction of pages, so at most of rows, holding
+                a value not in the set (Good-Turing)
+            :param raise_errors {Boolean}:
+                If True errors are raised rather than printed (default = False)
             :return set of unique values. Null values are represented as 'NULL'
            """
         try:
-            value_set = set()  # set to hold unique values
-            with arcpy.da.SearchCursor(self.path, field) as values:
-                for value in values:
-                    if value[0] is None:
-                        value_set.add("NULL")
-                    elif isinstance(value[0], (str, unicode)):
-                        if charset != 'ascii':
-                            value_set.add(value[0])
-                        else:
-                            # if unicode strings are causing problem, try
-                            value_set.add(value[0].encode('ascii', 'ignore'))
-                    else:
-                        value_set.add(value[0])
-            return value_set
+            if sample is not None:
+                counts, pages, rows_read = self._sample_value_counts(field, sample, charset)
+                return self._sample_result(set(counts), rows_read, _page_richness_estimates(pages))
+            accumulator = _ValueSetAccumulator(self.field_dict[field], charset)
+            self._accumulate(field, accumulator)
+            return accumulator.result
 
         except arcpy.ExecuteError:
+            if raise_errors:
+                raise
             output_msg(arcpy.GetMessages(2))
         except Exception as e:
+            if raise_errors:
+                raise
             output_msg(e.args[0])
 
-    def get_multiple_field_value_set(self, fields, sep=':'):
+    @_cached
+    def get_multiple_field_value_set(self, fields, sep=':', sample=None):
         """return a set of unique field values for an input table
         and any number of fields (values will be concatenated with sep)
         null values converted to 'NULL'
@@ -164,14 +360,34 @@ class TableObj(object):
             single field name or an array of field names (['Field1', 'Field2'])
         :param sep {String}:
             character to use as a separator (default = ':'
+        :param sample {Sample}:
+            If supplied only the sample is read and a SampleEstimate is returned
+            with the same estimates as get_field_value_set.
         """
         if not isinstance(fields, list):
             fieldslist = [fields]
         else:
             fieldslist = fields
+        import numpy
         import pandas
-        data = arcpy.da.TableToNumPyArray(self.path, fieldslist, null_value='NULL')
+        if sample is None:
+            data = arcpy.da.TableToNumPyArray(self.path, fieldslist, null_value='NULL')
+        else:
+            pages = [arcpy.da.TableToNumPyArray(self.path, fieldslist, where_clause, null_value='NULL')
+                     for where_clause in sample.where_clauses(self)]
+            pages = [page for page in pages if len(page)]
+            if not pages:
+                # empty table or sample, no rows read
+                return self._sample_result(set(), 0, _page_richness_estimates([]))
+            data = numpy.concatenate(pages)
         df = pandas.DataFrame(data)
+        if sample is not None:
+            rows_read = len(df)
+            # number of pages each combination of values is found in
+            page_numbers = numpy.repeat(numpy.arange(len(pages)), [len(page) for page in pages])
+            frequencies = df.assign(_page=page_numbers).drop_duplicates().groupby(fieldslist).size().values
+            estimates = _richness_estimates(frequencies, len(pages))
+            estimates['pages_read'] = len(pages)
         pandas.DataFrame.drop_duplicates(df, inplace=True)
         # concatenate values
         if len(fieldslist) > 1:
@@ -179,95 +395,430 @@ class TableObj(object):
         else:
             result = df.values.flatten()
         # return as a set
+        if sample is not None:
+            return self._sample_result(set(result), rows_read, estimates)
         return set(result)
 
-    def find_duplicate_field_values(self, field, charset='ascii'):
+    @_cached
+    def find_duplicate_field_values(self, field, charset='ascii', sample=None, raise_errors=False):
         """Return set of unique field values
             :param field {String}:
                 name of the field to parse
             :param: charset {String}:
                 character set to use (default = 'ascii').
                 Valid values are those in the Python documentation for string encode.
+            :param sample {Sample}:
+                If supplied only the sample is read and a SampleEstimate is returned.
+                Values duplicated across unsampled rows are not found.
+                estimates['duplicate_rate']: fraction of sampled rows repeating an earlier value
+            :param raise_errors {Boolean}:
+                If True errors are raised rather than printed (default = False)
             :return set of values which are duplicated in the field (ignores Null values).
            """
         try:
-            dup_set = set()  # set to hold duplicate values
-            value_set = set()  # set to hold unique values
-            with arcpy.da.SearchCursor(self.path, field) as values:
-                for value in values:
-                    if value[0] in value_set:
-                        dup_set.add(value[0])
-                    if isinstance(value[0], (str, unicode)):
-                        if charset != 'ascii':
-                            value_set.add(value[0])
-                        else:
-                            # if unicode strings are causing problem, try
-                            value_set.add(value[0].encode('ascii', 'ignore'))
-                    else:
-                        value_set.add(value[0])
-            return dup_set
+            accumulator = _DuplicatesAccumulator(self.field_dict[field], charset)
+            rows_read, pages_read = self._accumulate(field, accumulator, sample)
+            if sample is not None:
+                rate = float(accumulator.repeats) / rows_read if rows_read else 0.0
+                return self._sample_result(accumulator.result, rows_read, {'duplicate_rate': rate})
+            return accumulator.result
 
         except arcpy.ExecuteError:
+            if raise_errors:
+                raise
             output_msg(arcpy.GetMessages(2))
         except Exception as e:
+            if raise_errors:
+                raise
             output_msg(e.args[0])
 
+    def get_field_statistics(self, statistics, charset='ascii'):
+        """Calculate several field statistics in a single cursor pass.
+        Results match the single statistic methods.
+            :param statistics {array of tuples}:
+                (statistic, field) pairs. statistic is one of 'max' (get_max_field_value),
+                'longest' (get_max_field_value with lengthcomp), 'max_length' (get_max_field_value_length),
+                'value_set' (get_field_value_set) or 'duplicates' (find_duplicate_field_values)
+            :param: charset {String}:
+                character set used for value_set and duplicates (default = 'ascii')
+            :return dictionary of (statistic, field): value
+        """
+        accumulators = []
+        for statistic, field in statistics:
+            if statistic not in _ACCUMULATORS:
+                raise ValueError("Unknown statistic {0}".format(statistic))
+            if self.field_dict[field]['type'] == 'Geometry':
+                output_msg("Cannot process Geometry field")
+                continue
+            accumulators.append((statistic, field, _ACCUMULATORS[statistic](self.field_dict[field], charset)))
+        fields = sorted(set(field for statistic, field, acc in accumulators))
+        positions = dict((field, i) for i, field in enumerate(fields))
+        consumers = [(positions[field], acc.add) for statistic, field, acc in accumulators]
+        if fields:
+            for row in self._search_rows(fields):
+                for i, add in consumers:
+                    add(row[i])
+        return dict(((statistic, field), acc.result) for statistic, field, acc in accumulators)
+
+    @_cached
+    def get_geometry_stats(self, heaviest=10, batch_size=10000, vertices=True, sample=None):
+        """Profile the geometry of a featureclass in a single cursor pass.
+        Values are accumulated into numpy arrays in batches.
+            :param heaviest {Integer}:
+                number of features with the most vertices to report (default = 10)
+            :param batch_size {Integer}:
+                number of rows to buffer before they are added to the results (default = 10000)
+            :param vertices {Boolean}:
+                If False only the lighter SHAPE@AREA and SHAPE@LENGTH tokens are read,
+                vertex counts and heaviest features are not reported and the extent
+                is taken from the featureclass description (default = True).
+                Points are always read with SHAPE@XY.
+            :param sample {Sample}:
+                If supplied only the sample is read and a SampleEstimate is returned.
+                estimates holds 'count_estimate', 'null_count_estimate' and 'empty_count_estimate'
+                scaled up to the whole table.
+            :return named tuple (count, null_count, empty_count, extent, area, length,
+                vertex_count, heaviest). extent is (xmin, ymin, xmax, ymax),
+                area, length and vertex_count are Distribution named tuples
+                (min, max, mean, std, percentiles) or None if there are no values,
+                heaviest is a list of (oid, vertex count) sorted largest first.
+        """
+        import numpy
+        if not hasattr(self.describe_obj, 'shapeType'):
+            output_msg("{0} does not have a Geometry field".format(self.name))
+            return None
+        is_point = self.type == 'Point'
+        if is_point:
+            tokens = ['OID@', 'SHAPE@XY']
+        elif vertices:
+            tokens = ['OID@', 'SHAPE@']
+        else:
+            tokens = ['OID@', 'SHAPE@AREA', 'SHAPE@LENGTH']
+
+        # columns: xmin, ymin, xmax, ymax, area, length, vertex count
+        oid_buffer = numpy.empty(batch_size, dtype=numpy.int64)
+        value_buffer = numpy.empty((batch_size, 7), dtype=numpy.float64)
+        oid_batches = []
+        value_batches = []
+        null_count = 0
+        empty_count = 0
+        nan = float('nan')
+        i = 0
+        for row in self._search_rows(tokens, sample):
+            if is_point:
+                xy = row[1]
+                if xy is None or xy[0] is None:
+                    null_count += 1
+                    continue
+                x, y = xy
+                values = (x, y, x, y, 0.0, 0.0, 1)
+            elif vertices:
+                shape = row[1]
+                if shape is None:
+                    null_count += 1
+                    continue
+                if shape.pointCount == 0:
+                    empty_count += 1
+                    continue
+                ext = shape.extent
+                values = (ext.XMin, ext.YMin, ext.XMax, ext.YMax, shape.area, shape.length, shape.pointCount)
+            else:
+                if row[1] is None:
+                    null_count += 1
+                    continue
+                if not row[1] and not row[2]:
+                    empty_count += 1
+                    continue
+                values = (nan, nan, nan, nan, row[1], row[2], nan)
+            oid_buffer[i] = row[0]
+            value_buffer[i] = values
+            i += 1
+            if i == batch_size:
+                oid_batches.append(oid_buffer.copy())
+                value_batches.append(value_buffer.copy())
+                i = 0
+        if i:
+            oid_batches.append(oid_buffer[:i].copy())
+            value_batches.append(value_buffer[:i].copy())
+
+        if value_batches:
+            oids = numpy.concatenate(oid_batches)
+            values = numpy.concatenate(value_batches)
+        else:
+            oids = numpy.empty(0, dtype=numpy.int64)
+            values = numpy.empty((0, 7), dtype=numpy.float64)
+        del oid_batches, value_batches
+
+        if vertices or is_point:
+            if len(values):
+                extent = (float(values[:, 0].min()), float(values[:, 1].min()),
+                          float(values[:, 2].max()), float(values[:, 3].max()))
+            else:
+                extent = None
+            vertex_count = _distribution(values[:, 6])
+            heavy = _top_n(values[:, 6], heaviest)
+            heavy_list = [(int(oids[j]), int(values[j, 6])) for j in heavy]
+        else:
+            ext = self.describe_obj.extent
+            extent = (ext.XMin, ext.YMin, ext.XMax, ext.YMax)
+            vertex_count = None
+            heavy_list = []
+
+        count = len(values) + null_count + empty_count
+        result = GeometryStats(count, null_count, empty_count, extent,
+                               _distribution(values[:, 4]), _distribution(values[:, 5]), vertex_count, heavy_list)
+        if sample is not None:
+            sampled = self._sample_result(result, count, {})
+            scale = 1.0 / sampled.fraction if sampled.fraction else 0.0
+            sampled.estimates.update({'count_estimate': sampled.total_rows,
+                                      'null_count_estimate': null_count * scale,
+                                      'empty_count_estimate': empty_count * scale})
+            return sampled
+        return result
+
+    @_cached
+    def find_spatial_duplicates(self, tolerance=0.0, area_tolerance=None, sample=None):
+        """Return groups of coincident or near coincident features.
+        Feature locations (SHAPE@XY, the centroid for lines and polygons) are sorted and
+        features at the same location grouped directly. With a tolerance the distinct
+        locations are then snapped to a grid of tolerance sized cells (and with an area
+        tolerance, to bands of log area) and only locations in the same or neighbouring
+        cells are compared, rather than every pair of features. Groups are chained:
+        features within tolerance of any member of a group join it.
+            :param tolerance {Float}:
+                maximum distance in map units between features in a group (default = 0, exact match)
+            :param area_tolerance {Float}:
+                for polygons, maximum difference in area as a fraction of the larger area
+                (eg 0.01) for stacked polygons. Default None ignores area.
+            :param sample {Sample}:
+                If supplied only the sample is read and a SampleEstimate is returned.
+                Duplicates of unsampled features are not found.
+            :return list of groups of OIDs (each sorted), ordered by first OID
+        """
+        import numpy
+        if not hasattr(self.describe_obj, 'shapeType'):
+            output_msg("{0} does not have a Geometry field".format(self.name))
+            return None
+        use_area = area_tolerance is not None and self.type == 'Polygon'
+        tokens = ['OID@', 'SHAPE@XY'] + (['SHAPE@AREA'] if use_area else [])
+        rows = [(row[0], row[1][0], row[1][1], row[2] if use_area else 0.0)
+                for row in self._search_rows(tokens, sample) if row[1] is not None and row[1][0] is not None]
+        data = numpy.array(rows, dtype=numpy.float64).reshape(-1, 4)
+        del rows
+        oids = data[:, 0].astype(numpy.int64)
+        x = data[:, 1]
+        y = data[:, 2]
+        area = data[:, 3]
+
+        parent = list(range(len(oids)))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i, j):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j:
+                parent[root_j] = root_i
+
+        # features at the same location are next to each other, ordered by area,
+        # so chaining each to the next within the area tolerance joins them all
+        order = numpy.lexsort((area, y, x))
+        same = (numpy.diff(x[order]) == 0) & (numpy.diff(y[order]) == 0)
+        if use_area:
+            same &= numpy.diff(area[order]) <= area_tolerance * area[order[1:]]
+        for k in numpy.flatnonzero(same):
+            union(order[k], order[k + 1])
+
+        if tolerance > 0:
+            import itertools
+            import math
+            # one feature stands in for each location (and area, if areas are compared)
+            distinct = same if not use_area else same & (numpy.diff(area[order]) == 0)
+            first = numpy.concatenate(([True], ~distinct)) if len(order) else numpy.array([], dtype=bool)
+            candidates = order[first]
+            keys = [numpy.floor(x[candidates] / tolerance).astype(numpy.int64).tolist(),
+                    numpy.floor(y[candidates] / tolerance).astype(numpy.int64).tolist()]
+            if use_area:
+                # areas within the tolerance are within -log(1 - area_tolerance) of each other as logs
+                if area_tolerance >= 1:
+                    keys.append([0] * len(candidates))
+                elif area_tolerance > 0:
+                    log_area = numpy.log(numpy.maximum(area[candidates], 1e-300))
+                    keys.append(numpy.floor(log_area / -math.log(1 - area_tolerance)).astype(numpy.int64).tolist())
+                else:
+                    # only equal areas match
+                    keys.append(area[candidates].tolist())
+            cells = {}
+            for member, key in zip(candidates.tolist(), zip(*keys)):
+                cells.setdefault(key, []).append(member)
+            cells = dict((key, numpy.array(members)) for key, members in cells.items())
+
+            def join(first, second):
+                """union the members of second within tolerance of the members of first"""
+                dx = x[first][:, None] - x[second][None, :]
+                dy = y[first][:, None] - y[second][None, :]
+                close = dx * dx + dy * dy <= tolerance * tolerance
+                if use_area:
+                    larger = numpy.maximum(area[first][:, None], area[second][None, :])
+                    difference = numpy.abs(area[first][:, None] - area[second][None, :])
+                    close &= difference <= area_tolerance * larger
+                for i, j in zip(*numpy.nonzero(close)):
+                    union(first[i], second[j])
+
+            # each cell is compared with itself and the neighbours ahead of it, so each pair is seen once
+            neighbours = [offset for offset in itertools.product((-1, 0, 1), repeat=len(keys))
+                          if offset > (0,) * len(keys)]
+            for key, members in cells.items():
+                if len(members) > 1:
+                    join(members, members)
+                for offset in neighbours:
+                    other = cells.get(tuple(k + o for k, o in zip(key, offset)))
+                    if other is not None:
+                        join(members, other)
+
+        groups = {}
+        for i in range(len(oids)):
+            groups.setdefault(find(i), []).append(int(oids[i]))
+        result = sorted(sorted(group) for group in groups.values() if len(group) > 1)
+        if sample is not None:
+            return self._sample_result(result, len(oids), {})
+        return result
+
     def export_schema_to_csv(self, path):
         """Create a csv schema report of all fields in a featureclass,
         to the supplied path.
         """
-        import datetime
-        import os
-        import csv
-        # TODO convert to use csv
-        start_time = datetime.datetime.today()
-        start_date_string = start_time.strftime('%Y%m%d')
-        default_env = arcpy.env.workspace
-        fc = self.path
-        delimiter = ','
-        # nice to convert reported types to types accepted by add field tool
-        type_conversions = {"String": "TEXT", "Float": "FLOAT", "Double": "DOUBLE", "SmallInteger": "SHORT",
-                            "Integer": "LONG", "Date": "DATE", "Blob": "BLOB", "Raster": "RASTER", "GUID": "GUID",
-                            "TRUE": "True", "FALSE": "False"}
-
         output_msg("Processing: {}".format(self.path))
 
         try:
-            fc_type = self.type
-
-            report_dir = get_valid_output_path(path)
-            out_file_name = self.name + "_Field_Report " + start_date_string + ".csv"
-            out_file_path = os.path.join(report_dir, out_file_name)
-            output_msg("Report file: {0}".format(out_file_path))
-            with open(out_file_path, "w") as logFile:
-                logFile.write("Type,{}".format(fc_type))
-                logFile.write(
-                    "FieldName,FieldType,FieldPrecision,FieldScale,FieldLength,FieldAlias,isNullable,Required,"
-                    "FieldDomain,DefaultValue,Editable,BaseName\n")
-
-                for field in self.field_dict:
-                    output_msg("Writing {}".format(field.name))
-                    logFile.write("{0},{1},{2},{3},{4},{5},{6},{7},{8},{9},{10},{11}\n".format(
-                        field.name,
-                        type_conversions[field.type],
-                        field.precision,
-                        field.scale,
-                        field.length,
-                        field.aliasName,
-                        type_conversions[field.isNullable],
-                        type_conversions[field.required],
-                        field.domain,
-                        field.defaultValue,
-                        type_conversions[field.editable],
-                        field.baseName)
-                    )
-
-            return out_file_path
+            return self._write_schema_csv(path, "_Field_Report", [self.field_dict[f] for f in self.fields])
         except Exception as e:
             output_msg(str(e.args[0]))
             output_msg(arcpy.GetMessages())
 
-    def compare_field_values_to_domain(self, field, gdb, domain_name):
+    def _write_schema_csv(self, path, report_name, fields):
+        """Write field property dictionaries (as held in field_dict) to a csv schema report.
+            :param path {String}:
+                output folder
+            :param report_name {String}:
+                suffix added to the table name to make the file name
+            :param fields {array of dictionaries}:
+                field properties, one dictionary per field
+            :return path of the csv file
+        """
+        import csv
+        import datetime
+        import os
+        start_time = datetime.datetime.today()
+        start_date_string = start_time.strftime('%Y%m%d')
+
+        report_dir = get_valid_output_path(path)
+        out_file_name = self.name + report_name + " " + start_date_string + ".csv"
+        out_file_path = os.path.join(report_dir, out_file_name)
+        output_msg("Report file: {0}".format(out_file_path))
+        with open(out_file_path, "w") as logFile:
+            writer = csv.writer(logFile, lineterminator='\n')
+            writer.writerow(["Type", self.type])
+            writer.writerow(["FieldName", "FieldType", "FieldPrecision", "FieldScale", "FieldLength", "FieldAlias",
+                             "isNullable", "Required", "FieldDomain", "DefaultValue", "Editable", "BaseName"])
+
+            for field in fields:
+                output_msg("Writing {}".format(field['name']))
+                writer.writerow([
+                    field['name'],
+                    _TYPE_CONVERSIONS.get(field['type'], field['type']),
+                    field['precision'],
+                    field['scale'],
+                    field['length'],
+                    field['aliasName'],
+                    _TYPE_CONVERSIONS.get(field['isNullable'], field['isNullable']),
+                    _TYPE_CONVERSIONS.get(field['required'], field['required']),
+                    field['domain'],
+                    field['defaultValue'],
+                    _TYPE_CONVERSIONS.get(field['editable'], field['editable']),
+                    field['baseName']])
+        return out_file_path
+
+    def right_size_schema(self, path, headroom=0.1, round_to=5, bytes_per_char=1, integral_floats=False):
+        """Measure all text and numeric fields in a single scan and propose a compacted schema.
+        Text fields are shrunk to the longest value plus headroom, integers whose range plus
+        headroom fits are proposed as SmallInteger, doubles with 6 or fewer significant digits
+        as Single and, if integral_floats is set, floats holding only whole numbers as (Small)Integer. Observed precision and scale
+        are proposed for numeric fields (used by enterprise geodatabases).
+        The proposed schema is written in the same csv format as export_schema_to_csv.
+            :param path {String}:
+                output folder for the csv report
+            :param headroom {Float}:
+                fraction added to the longest observed text value, and to the size of the
+                smallest and largest observed numbers, to allow for growth (default = 0.1)
+            :param round_to {Integer}:
+                proposed text lengths are rounded up to a multiple of this (default = 5)
+            :param bytes_per_char {Integer}:
+                storage per text character used for the estimate (default = 1, use 2 for nvarchar)
+            :param integral_floats {Boolean}:
+                propose integer types for Single and Double fields holding only whole numbers.
+                Later decimal values would be truncated, so only set this if the field
+                should never hold them (default = False)
+            :return named tuple (report, row_count, changes, bytes_saved).
+                changes is a list of FieldChange named tuples
+                (field, old_type, new_type, old_length, new_length, precision, scale, bytes_saved)
+        """
+        import math
+        measures = [_FieldMeasure(self.field_dict[f]) for f in self.fields
+                    if self.field_dict[f]['type'] in _MEASURED_TYPES]
+        if not measures:
+            output_msg("No text or numeric fields to measure in {0}".format(self.name))
+            return None
+
+        row_count = 0
+        with arcpy.da.SearchCursor(self.path, [m.name for m in measures]) as rows:
+            for row in rows:
+                row_count += 1
+                for measure, value in zip(measures, row):
+                    if value is not None:
+                        measure.add(value)
+
+        changes = []
+        proposed = dict(self.field_dict)
+        for measure in measures:
+            field = self.field_dict[measure.name]
+            new = dict(field)
+            if measure.count == 0:
+                continue
+            # whole numbers that may be stored as integers
+            whole = measure.integral and (integral_floats or field['type'] not in ('Single', 'Double'))
+            if field['type'] == 'String':
+                length = int(math.ceil(measure.max_length * (1 + headroom) / float(round_to)) * round_to)
+                new['length'] = max(length, round_to)
+            elif whole and _fits(measure, 'SmallInteger', headroom):
+                new['type'] = 'SmallInteger'
+            elif whole and _fits(measure, 'Integer', headroom):
+                new['type'] = 'Integer'
+            elif field['type'] == 'Double' and measure.precision is not None and measure.precision <= 6:
+                new['type'] = 'Single'
+            if measure.precision is not None and field['type'] != 'String':
+                new['precision'] = measure.precision
+                new['scale'] = 0 if new['type'] in ('SmallInteger', 'Integer') else measure.scale
+
+            old_size = _field_storage(field, bytes_per_char)
+            new_size = _field_storage(new, bytes_per_char)
+            if new_size >= old_size:
+                # never propose a larger field
+                continue
+            proposed[measure.name] = new
+            saved = (old_size - new_size) * row_count
+            changes.append(FieldChange(measure.name, field['type'], new['type'], field['length'], new['length'],
+                                       new['precision'], new['scale'], saved))
+
+        report = self._write_schema_csv(path, "_Field_Recommendations", [proposed[f] for f in self.fields])
+        bytes_saved = sum(c.bytes_saved for c in changes)
+        output_msg("{0} fields can be reduced, estimated saving {1} bytes".format(len(changes), bytes_saved))
+        return SchemaAdvice(report, row_count, changes, bytes_saved)
+
+    def compare_field_values_to_domain(self, field, gdb, domain_name, sample=None, field_values=None):
         """compare field values with domain values
             return a named tuple (matched = values in domain,
             unmatched = values outside of domain
@@ -277,10 +828,25 @@ class TableObj(object):
                 Geodatabase path
             :param domain_name {string}
                 Domain name in gdb
+            :param sample {Sample}
+                If supplied only the sample is read and a SampleEstimate wrapping the result is returned.
+                estimates['outside_rows'] is the number of sampled rows outside the domain,
+                estimates['outside_pages'] the number of pages holding them (of estimates['pages_read']) and
+                estimates['outside_rate_95']: with 95% confidence fewer than this fraction of
+                rows in the table are outside the domain (the bound for the fraction of pages).
+            :param field_values {set}
+                If supplied these values (eg from get_field_statistics) are compared
+                instead of reading the table
+            The comparison isn't cached (the domain can change while the table doesn't),
+            the field values read for it are.
         """
         from collections import namedtuple
         nt = namedtuple('Result', 'match unmatched')
-        field_values = self.get_field_value_set(field)
+        if sample is not None:
+            counts, pages, rows_read = self._sample_value_counts(field, sample)
+            field_values = set(counts)
+        elif field_values is None:
+            field_values = self.get_field_value_set(field)
         domain_values = []
         domain_type = None
         field_in_domain = []
@@ -312,6 +878,14 @@ class TableObj(object):
                 else:
                     field_out_domain.append(value)
 
+        if sample is not None:
+            outside = set(field_out_domain)
+            outside_rows = sum(counts[value] for value in outside)
+            outside_pages = sum(1 for page in pages if not outside.isdisjoint(page))
+            return self._sample_result(nt(field_in_domain, field_out_domain), rows_read,
+                                       {'outside_rows': outside_rows, 'outside_pages': outside_pages,
+                                        'pages_read': len(pages),
+                                        'outside_rate_95': _upper_rate_95(outside_pages, len(pages))})
         return nt(field_in_domain, field_out_domain)
 
     def pretty_print(self):
@@ -362,17 +936,256 @@ def get_max_field_value(input_fc, field, treatasfloat=False):
     return result
 
 
+class _FieldMeasure(object):
+    """Observed length, range, precision and scale of the values in a field"""
+    __slots__ = ('name', 'is_text', 'count', 'max_length', 'min', 'max', 'integral', 'int_digits', 'scale')
+
+    def __init__(self, field):
+        self.name = field['name']
+        self.is_text = field['type'] == 'String'
+        self.count = 0
+        self.max_length = 0
+        self.min = None
+        self.max = None
+        self.integral = not self.is_text
+        self.int_digits = 0
+        self.scale = 0
+
+    def add(self, value):
+        self.count += 1
+        if self.is_text:
+            if len(value) > self.max_length:
+                self.max_length = len(value)
+            return
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if self.int_digits is None:
+            return
+        text = repr(value).rstrip('L')
+        if 'e' in text or 'n' in text:
+            # exponent, inf or nan - precision can't be proposed
+            self.int_digits = None
+            self.integral = False
+            return
+        whole, _, fraction = text.lstrip('-').partition('.')
+        fraction = fraction.rstrip('0')
+        if fraction:
+            self.integral = False
+            if len(fraction) > self.scale:
+                self.scale = len(fraction)
+        digits = len(whole.lstrip('0')) or 1
+        if digits > self.int_digits:
+            self.int_digits = digits
+
+    @property
+    def precision(self):
+        if self.int_digits is None:
+            return None
+        return self.int_digits + self.scale
+
+
+class _MaxAccumulator(object):
+    """largest value of a field, or with lengthcomp the longest string, as get_max_field_value"""
+    def __init__(self, field, charset='ascii', lengthcomp=False):
+        self.is_text = field['type'] == 'String'
+        self.lengthcomp = lengthcomp and self.is_text
+        self.result = '' if self.is_text else 0
+
+    def add(self, value):
+        if value is None:
+            return
+        if self.lengthcomp:
+            if len(value) > len(self.result):
+                self.result = value
+        elif value > self.result:
+            self.result = value
+
+
+class _LongestAccumulator(_MaxAccumulator):
+    """longest string of a field, as get_max_field_value with lengthcomp"""
+    def __init__(self, field, charset='ascii'):
+        _MaxAccumulator.__init__(self, field, charset, lengthcomp=True)
+
+
+class _MaxLengthAccumulator(object):
+    """length of the longest value of a field, as get_max_field_value_length"""
+    def __init__(self, field, charset='ascii'):
+        self.result = 0
+
+    def add(self, value):
+        if value is not None:
+            length = len(str(value))
+            if length > self.result:
+                self.result = length
+
+
+class _ValueSetAccumulator(object):
+    """unique values of a field, as get_field_value_set.
+    If counted the number of rows holding each value is kept in counts
+    and the set of values in each sample page in pages."""
+    def __init__(self, field, charset='ascii', counted=False):
+        from collections import Counter
+        self.charset = charset
+        self.counts = Counter() if counted else None
+        self.pages = [] if counted else None
+        self.page = set()
+        self.values = set()
+
+    @property
+    def result(self):
+        if self.counts is not None:
+            return set(self.counts)
+        return self.values
+
+    def add(self, value):
+        if self.counts is not None:
+            value = _set_value(value, self.charset)
+            self.counts[value] += 1
+            self.page.add(value)
+        else:
+            self.values.add(_set_value(value, self.charset))
+
+    def end_page(self):
+        if self.pages is not None:
+            self.pages.append(self.page)
+            self.page = set()
+
+
+class _DuplicatesAccumulator(object):
+    """duplicated values of a field, as find_duplicate_field_values.
+    repeats counts the rows repeating an earlier value."""
+    def __init__(self, field, charset='ascii'):
+        self.charset = charset
+        self.values = set()
+        self.result = set()
+        self.repeats = 0
+
+    def add(self, value):
+        if value in self.values:
+            self.result.add(value)
+            self.repeats += 1
+        if isinstance(value, (str, unicode)) and self.charset == 'ascii':
+            # if unicode strings are causing problem, try
+            value = value.encode('ascii', 'ignore')
+        self.values.add(value)
+
+
+_ACCUMULATORS = {'max': _MaxAccumulator, 'longest': _LongestAccumulator, 'max_length': _MaxLengthAccumulator,
+                 'value_set': _ValueSetAccumulator, 'duplicates': _DuplicatesAccumulator}
+
+
+def _fits(measure, field_type, headroom=0.0):
+    """True if the observed range of a measured field, widened by headroom
+    (a fraction of the size of each end), fits an integer field type"""
+    low, high = _TYPE_RANGES[field_type]
+    return (low <= measure.min - headroom * abs(measure.min) and
+            measure.max + headroom * abs(measure.max) <= high)
+
+
+def _field_storage(field, bytes_per_char=1):
+    """Estimated bytes per row used by a field"""
+    if field['type'] == 'String':
+        return field['length'] * bytes_per_char
+    return _TYPE_SIZES.get(field['type'], 0)
+
+
+def _set_value(value, charset='ascii'):
+    """Convert a field value for use in a value set. Nulls become 'NULL'"""
+    if value is None:
+        return "NULL"
+    elif isinstance(value, (str, unicode)):
+        if charset != 'ascii':
+            return value
+        # if unicode strings are causing problem, try
+        return value.encode('ascii', 'ignore')
+    return value
+
+
+def _upper_rate_95(hits, n):
+    """Upper bound of the 95% confidence interval for the rate of hits in n sampled units
+    (sample pages, as rows within a page are not independent).
+    Uses the exact bound 1 - 0.05 ** (1 / n) (about 3 / n) when there are no hits,
+    otherwise the Wilson score interval."""
+    import math
+    if n <= 0:
+        return 1.0
+    if hits == 0:
+        return 1 - 0.05 ** (1.0 / n)
+    z = 1.96
+    p = float(hits) / n
+    centre = p + z * z / (2 * n)
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return min(1.0, (centre + spread) / (1 + z * z / n))
+
+
+def _richness_estimates(frequencies, n):
+    """Estimated distinct values (Chao2) and the Good-Turing estimate of the
+    fraction of sampling units holding a value not seen in a sample
+        :param frequencies: number of sampling units (sample pages) holding each distinct value
+        :param n: number of sampling units read
+    """
+    frequencies = list(frequencies)
+    singletons = sum(1 for f in frequencies if f == 1)
+    doubletons = sum(1 for f in frequencies if f == 2)
+    correction = (n - 1.0) / n if n else 0.0
+    if doubletons:
+        unseen = correction * singletons * singletons / (2.0 * doubletons)
+    else:
+        unseen = correction * singletons * (singletons - 1) / 2.0
+    return {'distinct_estimate': len(frequencies) + unseen,
+            'unseen_rate': float(singletons) / n if n else 1.0}
+
+
+def _page_richness_estimates(pages):
+    """_richness_estimates from the number of sample pages each value is found in
+        :param pages: list of the sets of values in each page read
+    """
+    from collections import Counter
+    incidence = Counter(value for page in pages for value in page)
+    estimates = _richness_estimates(incidence.values(), len(pages))
+    estimates['pages_read'] = len(pages)
+    return estimates
+
+
+def _distribution(values):
+    """Summarise a numpy array as a Distribution named tuple, ignoring NaN values.
+    Returns None if there are no values."""
+    import numpy
+    values = values[~numpy.isnan(values)]
+    if not values.size:
+        return None
+    percentiles = numpy.percentile(values, _PERCENTILES)
+    return Distribution(float(values.min()), float(values.max()), float(values.mean()), float(values.std()),
+                        dict(zip(_PERCENTILES, [float(p) for p in percentiles])))
+
+
+def _top_n(values, n):
+    """Return the indexes of the n largest values in a numpy array, largest first"""
+    import numpy
+    if n <= 0 or not values.size:
+        return []
+    if n < values.size:
+        idx = numpy.argpartition(values, -n)[-n:]
+    else:
+        idx = numpy.arange(values.size)
+    return idx[numpy.argsort(values[idx])[::-1]].tolist()
+
+
 def compare_schema(fc1, fc2):
     """compare the schemas of two tables. Return an array of results.
-    :param fc1 {String}:
+    :param fc1 {String or TableObj}:
             Path or reference to feature class or table.
-    :param fc2 {String}:
+    :param fc2 {String or TableObj}:
             Path or reference to feature class or table.
     :return array of results (field not found, field same, etc)
     """
     result_arr= []
-    fcobj1 = TableObj(fc1)
-    fcobj2 = TableObj(fc2)
+    fcobj1 = fc1 if isinstance(fc1, TableObj) else TableObj(fc1)
+    fcobj2 = fc2 if isinstance(fc2, TableObj) else TableObj(fc2)
+    fc1 = fcobj1.path
+    fc2 = fcobj2.path
     field_dict1 = fcobj1.field_dict
     field_dict2 = fcobj2.field_dict
     for ifield in sorted(list(set(field_dict1.keys()+field_dict2.keys()))):
@@ -405,6 +1218,666 @@ def compare_schema(fc1, fc2):
     return result_arr
 
 
+def diff_table_data(table1, table2, key_field, fields=None, geometry=False, method='auto', partitions=16):
+    """Compare the rows of two tables (eg yesterday's and today's copy of a featureclass).
+    Each row is reduced to a hash of the chosen attributes (and optionally the geometry WKB)
+    and the tables are joined on a key field without loading either table into memory.
+    The 'merge' method streams both tables sorted on the key (ORDER BY sql_clause).
+    The 'partition' method spills the hashes to temporary files by key and
+    compares one partition at a time.
+    :param table1 {String}:
+            Path or reference to the old feature class or table.
+    :param table2 {String}:
+            Path or reference to the new feature class or table.
+    :param key_field {String}:
+            name of a field holding a unique key in both tables. Rows with a null key are ignored,
+            a repeated key raises ValueError.
+    :param fields {array of String values}:
+            fields to compare (default = non-required fields found in both tables)
+    :param geometry {Boolean}:
+            If True also compare the geometry (as WKB)
+    :param method {String}:
+            'auto' (default) tries 'merge' and falls back to 'partition'
+            if the keys are not returned in sorted order, or 'merge' or 'partition'
+    :param partitions {Integer}:
+            number of temporary files used by the partition method (default = 16)
+    :return named tuple of sorted key lists (inserted = only in table2,
+            deleted = only in table1, modified = attributes differ)
+    """
+    if fields is None:
+        fields2 = TableObj(table2).fields2
+        fields = [f for f in TableObj(table1).fields2 if f in fields2 and f != key_field]
+    tokens = [key_field] + list(fields)
+    if geometry:
+        tokens.append('SHAPE@WKB')
+
+    if method in ('auto', 'merge'):
+        try:
+            return _merge_diff(_row_hashes(table1, tokens, True), _row_hashes(table2, tokens, True),
+                               (table1, table2))
+        except _UnsortedKeys:
+            if method == 'merge':
+                raise
+            output_msg("Keys are not in sorted order, comparing by partition")
+    return _partition_diff(_row_hashes(table1, tokens), _row_hashes(table2, tokens), partitions, (table1, table2))
+
+
+class _UnsortedKeys(Exception):
+    """Raised when a sorted merge reads keys out of order"""
+
+
+def _row_digest(values):
+    """Return an md5 digest of a row's values"""
+    import hashlib
+    digest = hashlib.md5()
+    for value in values:
+        if isinstance(value, (bytes, bytearray)):
+            digest.update(bytes(value))
+        else:
+            digest.update(repr(value).encode('utf-8'))
+        digest.update(b'\x1f')
+    return digest.digest()
+
+
+def _row_hashes(table, tokens, order_by_key=False):
+    """Yield (key, digest) for each row of a table with a key value.
+    The key is the first of the tokens."""
+    sql_clause = (None, None)
+    if order_by_key:
+        sql_clause = (None, 'ORDER BY {0}'.format(arcpy.AddFieldDelimiters(table, tokens[0])))
+    with arcpy.da.SearchCursor(table, tokens, sql_clause=sql_clause) as rows:
+        for row in rows:
+            if row[0] is not None:
+                yield row[0], _row_digest(row[1:])
+
+
+def _sorted_pairs(pairs, table):
+    """Pass on (key, value) pairs, raising _UnsortedKeys unless keys are increasing
+    and ValueError if a key is repeated"""
+    previous = None
+    for pair in pairs:
+        if previous is not None and not previous < pair[0]:
+            if previous == pair[0]:
+                raise ValueError("Duplicate key {0!r} in {1}".format(pair[0], table))
+            raise _UnsortedKeys(pair[0])
+        previous = pair[0]
+        yield pair
+
+
+def _merge_diff(old_pairs, new_pairs, tables=('table1', 'table2')):
+    """Diff two streams of (key, digest) sorted by key"""
+    inserted, deleted, modified = [], [], []
+    old_pairs = _sorted_pairs(old_pairs, tables[0])
+    new_pairs = _sorted_pairs(new_pairs, tables[1])
+    old = next(old_pairs, None)
+    new = next(new_pairs, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            deleted.append(old[0])
+            old = next(old_pairs, None)
+        elif old is None or new[0] < old[0]:
+            inserted.append(new[0])
+            new = next(new_pairs, None)
+        else:
+            if old[1] != new[1]:
+                modified.append(old[0])
+            old = next(old_pairs, None)
+            new = next(new_pairs, None)
+    return DataDiff(inserted, deleted, modified)
+
+
+def _partition_to_disk(pairs, folder, prefix, partitions):
+    """Write (key, value) pairs to temporary files, partitioned by the hash of the key.
+    Return the list of file paths."""
+    import os
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    paths = [os.path.join(folder, "{0}_{1}.tmp".format(prefix, i)) for i in range(partitions)]
+    files = [open(path, 'wb') for path in paths]
+    try:
+        for pair in pairs:
+            pickle.dump(pair, files[hash(pair[0]) % partitions], pickle.HIGHEST_PROTOCOL)
+    finally:
+        for f in files:
+            f.close()
+    return paths
+
+
+def _read_partition(path):
+    """Yield the (key, value) pairs written to a partition file"""
+    try:
+        import cPickle as pickle
+    except ImportError:
+        import pickle
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _partition_diff(old_pairs, new_pairs, partitions=16, tables=('table1', 'table2')):
+    """Diff two unsorted streams of (key, digest) using hash partitions on disk.
+    Raises ValueError if a key is repeated in either stream."""
+    import shutil
+    import tempfile
+    inserted, deleted, modified = [], [], []
+    folder = tempfile.mkdtemp(prefix='arc_utils_')
+    try:
+        old_paths = _partition_to_disk(old_pairs, folder, 'old', partitions)
+        new_paths = _partition_to_disk(new_pairs, folder, 'new', partitions)
+        for old_path, new_path in zip(old_paths, new_paths):
+            old = {}
+            for key, digest in _read_partition(old_path):
+                if key in old:
+                    raise ValueError("Duplicate key {0!r} in {1}".format(key, tables[0]))
+                old[key] = digest
+            seen = set()
+            for key, digest in _read_partition(new_path):
+                if key in seen:
+                    raise ValueError("Duplicate key {0!r} in {1}".format(key, tables[1]))
+                seen.add(key)
+                old_digest = old.pop(key, None)
+                if old_digest is None:
+                    inserted.append(key)
+                elif old_digest != digest:
+                    modified.append(key)
+            deleted.extend(old)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return DataDiff(sorted(inserted), sorted(deleted), sorted(modified))
+
+
+def analyze_tables(jobs, max_workers=4, connections_per_workspace=2, cache=False):
+    """Run TableObj statistics for many tables concurrently.
+    A job is (table, fields, statistics) where statistics are TableObj method names
+    (get_max_field_value, get_max_field_value_length, get_field_value_set,
+    find_duplicate_field_values, get_geometry_stats, find_spatial_duplicates).
+    Jobs run in a pool of worker processes rather than threads, as arcpy (geoprocessing
+    tools, Describe and cursors sharing workspaces) is not thread safe under Python 2.7.
+    Each worker process keeps its TableObjs, so a table is described once per worker and
+    the worker's workspace connections are reused by later jobs. No more than
+    connections_per_workspace jobs use a workspace (eg an .sde file) at once.
+    When run from the ArcMap python window, first point multiprocessing at python
+    rather than ArcMap.exe:
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
+    Usage: for result in analyze_tables([(path, ['Field1'], ['get_field_value_set'])]):
+    :param jobs {array of AnalysisJob or tuple}:
+            jobs to run
+    :param max_workers {Integer}:
+            number of worker processes (default = 4)
+    :param connections_per_workspace {Integer}:
+            number of jobs run at the same time against a workspace (default = 2)
+    :param cache {Boolean}:
+            If True each worker process keeps a ResultCache for its tables (default = False)
+    :return generator of named tuples (job, results, error, seconds) in the order jobs finish.
+            results is a dictionary of (statistic, field): value (field is None for table statistics).
+            error is the traceback text if the job failed, otherwise None.
+    """
+    import multiprocessing
+    jobs = [AnalysisJob(*job) for job in jobs]
+    if not jobs:
+        return
+    semaphores = dict((_workspace_path(job.table), multiprocessing.BoundedSemaphore(connections_per_workspace))
+                      for job in jobs)
+    pool = multiprocessing.Pool(min(max_workers, len(jobs)), _init_worker, (semaphores, cache))
+    try:
+        for result in pool.imap_unordered(_run_worker_job, jobs):
+            yield result
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+_worker_pool = None
+
+
+def _init_worker(semaphores, cache):
+    """Set up the _WorkspacePool of an analyze_tables worker process"""
+    global _worker_pool
+    from .cache import ResultCache
+    _worker_pool = _WorkspacePool(semaphores, ResultCache() if cache else None)
+
+
+def _run_worker_job(job):
+    return _run_job(job, _worker_pool)
+
+
+class _WorkspacePool(object):
+    """Limits the jobs using each workspace at the same time and keeps a TableObj per table"""
+    def __init__(self, semaphores, cache=None):
+        self.cache = cache
+        self._semaphores = semaphores
+        self._tables = {}
+
+    def semaphore(self, table_path):
+        return self._semaphores[_workspace_path(table_path)]
+
+    def table(self, table_path):
+        tbl = self._tables.get(table_path)
+        if tbl is None:
+            # described outside any lock, the first stored TableObj is kept
+            tbl = self._tables.setdefault(table_path, TableObj(table_path, cache=self.cache))
+        return tbl
+
+
+def _workspace_path(table_path):
+    """Return the workspace (.sde, .gdb, .mdb or folder) holding a table"""
+    import os
+    path = table_path
+    while path:
+        if path.lower().endswith(('.sde', '.gdb', '.mdb')):
+            return path
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return os.path.dirname(table_path)
+
+
+def _run_job(job, pool):
+    """Run the statistics of an analysis job, returning a JobResult"""
+    import time
+    import traceback
+    start = time.time()
+    results = {}
+    error = None
+    semaphore = pool.semaphore(job.table)
+    semaphore.acquire()
+    try:
+        tbl = pool.table(job.table)
+        fields = [job.fields] if isinstance(job.fields, (str, unicode)) else job.fields or []
+        for statistic in job.statistics:
+            if statistic in _TABLE_STATISTICS:
+                results[(statistic, None)] = getattr(tbl, statistic)()
+            elif statistic in _FIELD_STATISTICS:
+                kwargs = {'raise_errors': True} if statistic in _RAISING_STATISTICS else {}
+                for field in fields:
+                    results[(statistic, field)] = getattr(tbl, statistic)(field, **kwargs)
+            else:
+                raise ValueError("Unknown statistic {0}".format(statistic))
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        semaphore.release()
+    return JobResult(job, results, error, time.time() - start)
+
+
+def bulk_load(source, target, field_map=None, xy_fields=None, batch_size=50000, edit_session=True,
+              progress=True, max_rejects_reported=100):
+    """Load rows from a csv file, numpy structured array or pandas DataFrame into an existing table.
+    Each batch is validated and converted to the target field types column by column
+    (values that can't be converted, are too long or out of range, and nulls in
+    non-nullable fields reject the row), then written through one InsertCursor
+    inside a single edit session.
+    A numpy array loaded to a table that does not exist is written with NumPyArrayToTable.
+    :param source {String, numpy array or DataFrame}:
+            path to a csv file, a numpy structured array or a pandas DataFrame
+    :param target {String}:
+            Path or reference to feature class or table.
+    :param field_map {Dictionary}:
+            source column: target field (default = columns with the same name as a target field)
+    :param xy_fields {tuple}:
+            (x column, y column) to load as point geometry (SHAPE@XY)
+    :param batch_size {Integer}:
+            number of rows validated and written at a time (default = 50000)
+    :param edit_session {Boolean}:
+            If True (default) write inside an arcpy.da.Editor session. Required for versioned data.
+    :param progress {Boolean}:
+            If True (default) report rows loaded and rows/sec after each batch
+    :param max_rejects_reported {Integer}:
+            number of rejected source row numbers to return (default = 100)
+    :return named tuple (rows_read, rows_loaded, rows_rejected, seconds, rows_per_second, rejected_rows)
+    """
+    import time
+    import numpy
+    start = time.time()
+    if isinstance(source, numpy.ndarray) and not arcpy.Exists(target):
+        arcpy.da.NumPyArrayToTable(source, target)
+        seconds = time.time() - start
+        return LoadResult(len(source), len(source), 0, seconds, len(source) / seconds if seconds else 0, [])
+
+    tbl = TableObj(target)
+    batches = _source_batches(source, batch_size)
+    rows_read = 0
+    rows_loaded = 0
+    rejected_rows = []
+    rows_rejected = 0
+    workspace = _workspace_path(target)
+    editor = arcpy.da.Editor(workspace) if edit_session else None
+    if editor is not None:
+        editor.startEditing(False, getattr(tbl.describe_obj, 'isVersioned', False))
+        editor.startOperation()
+    cursor = None
+    loaded = False
+    try:
+        try:
+            for batch in batches:
+                if cursor is None:
+                    if field_map is None:
+                        lookup = dict((f.lower(), f) for f in tbl.fields2)
+                        field_map = dict((c, lookup[c.lower()]) for c in batch.columns if c.lower() in lookup)
+                    columns = [c for c in batch.columns if c in field_map]
+                    tokens = [field_map[c] for c in columns]
+                    if xy_fields:
+                        tokens.append('SHAPE@XY')
+                    cursor = arcpy.da.InsertCursor(target, tokens)
+                fields = [tbl.field_dict[f] for f in tokens if f != 'SHAPE@XY']
+                rows, rejected = _coerce_batch(batch, columns, fields, xy_fields)
+                for row in rows:
+                    cursor.insertRow(row)
+                if len(rejected) and len(rejected_rows) < max_rejects_reported:
+                    rejected_rows.extend((rejected + rows_read)[:max_rejects_reported - len(rejected_rows)].tolist())
+                rows_read += len(batch)
+                rows_loaded += len(rows)
+                rows_rejected += len(rejected)
+                if progress:
+                    seconds = time.time() - start
+                    output_msg("Loaded {0} of {1} rows ({2:.0f} rows/sec)".format(
+                        rows_loaded, rows_read, rows_loaded / seconds if seconds else 0))
+            loaded = True
+        finally:
+            # release the cursor and its lock before the edit session ends
+            if cursor is not None:
+                del cursor
+    finally:
+        if editor is not None and editor.isEditing:
+            if loaded:
+                editor.stopOperation()
+                editor.stopEditing(True)
+            else:
+                editor.abortOperation()
+                editor.stopEditing(False)
+
+    seconds = time.time() - start
+    result = LoadResult(rows_read, rows_loaded, rows_rejected, seconds,
+                        rows_loaded / seconds if seconds else 0, rejected_rows)
+    output_msg("Loaded {0} rows, rejected {1} in {2:.1f} seconds".format(rows_loaded, rows_rejected, seconds))
+    return result
+
+
+def _source_batches(source, batch_size):
+    """Yield a pandas DataFrame for each batch of rows from a csv path, numpy array or DataFrame"""
+    import pandas
+    if isinstance(source, (str, unicode)):
+        for chunk in pandas.read_csv(source, dtype=object, chunksize=batch_size):
+            yield chunk
+        return
+    if not isinstance(source, pandas.DataFrame):
+        source = pandas.DataFrame(source)
+    for start in range(0, len(source), batch_size):
+        yield source.iloc[start:start + batch_size]
+
+
+def _coerce_batch(batch, columns, fields, xy_fields=None):
+    """Convert the columns of a batch to the types of the target fields.
+    :return (list of rows ready to insert, numpy array of rejected row positions)
+    """
+    import numpy
+    import pandas
+    n = len(batch)
+    bad = numpy.zeros(n, dtype=bool)
+    converted = []
+    for column, field in zip(columns, fields):
+        values, invalid = _coerce_column(batch[column], field)
+        converted.append(values)
+        bad |= invalid
+    if xy_fields:
+        x = pandas.to_numeric(batch[xy_fields[0]], errors='coerce').values
+        y = pandas.to_numeric(batch[xy_fields[1]], errors='coerce').values
+        bad |= numpy.isnan(x) | numpy.isnan(y)
+        xy = numpy.empty(n, dtype=object)
+        for i, pair in enumerate(zip(x.tolist(), y.tolist())):
+            xy[i] = pair
+        converted.append(xy)
+    good = ~bad
+    if converted:
+        rows = numpy.column_stack([values[good] for values in converted]).tolist()
+    else:
+        rows = [[] for i in range(int(good.sum()))]
+    return rows, numpy.flatnonzero(bad)
+
+
+def _coerce_column(column, field):
+    """Convert a pandas Series to python values for a field.
+    :return (numpy object array with None for nulls, numpy bool array of invalid values)
+    """
+    import numpy
+    import pandas
+    present = column.notnull().values
+    field_type = field['type']
+    if field_type in ('SmallInteger', 'Integer', 'Single', 'Double', 'OID'):
+        numbers = pandas.to_numeric(column, errors='coerce').values.astype(numpy.float64)
+        ok = ~numpy.isnan(numbers)
+        if field_type in _TYPE_RANGES:
+            low, high = _TYPE_RANGES[field_type]
+            with numpy.errstate(invalid='ignore'):
+                ok &= (numpy.mod(numbers, 1) == 0) & (numbers >= low) & (numbers <= high)
+            python_values = numbers[ok].astype(numpy.int64).tolist()
+        else:
+            python_values = numbers[ok].tolist()
+    elif field_type == 'Date':
+        dates = pandas.to_datetime(column, errors='coerce')
+        ok = dates.notnull().values
+        python_values = list(dates[ok].dt.to_pydatetime())
+    else:
+        text = column[present].astype(unicode)
+        ok = present.copy()
+        if field.get('length'):
+            ok[present] = (text.str.len() <= field['length']).values
+        python_values = column[ok].astype(unicode).tolist()
+    values = numpy.empty(len(column), dtype=object)
+    values[ok] = python_values
+    invalid = present & ~ok
+    if not field['isNullable']:
+        invalid |= ~present
+    return values, invalid
+
+
+def check_referential_integrity(parent_table, parent_key, child_table, child_key=None, sample_size=5,
+                                memory_budget=256 * 1024 * 1024, batch_size=50000, partitions=16):
+    """Check that every key in a child table exists in a parent table (eg every PARCEL_ID
+    in a permits table exists in parcels). The parent keys are read in one scan into a
+    sorted numpy array (numeric keys) or a set, then the child table is streamed in batches.
+    If the parent keys would use more than memory_budget bytes, parent and child keys
+    are spilled to temporary files by hash partition and checked one partition at a time.
+    :param parent_table {String}:
+            Path or reference to the parent feature class or table.
+    :param parent_key {String}:
+            key field in the parent table
+    :param child_table {String}:
+            Path or reference to the child feature class or table.
+    :param child_key {String}:
+            foreign key field in the child table (default = parent_key)
+    :param sample_size {Integer}:
+            number of OIDs to report for each orphan key (default = 5)
+    :param memory_budget {Integer}:
+            bytes the parent keys may use before spilling to disk (default = 256MB).
+            Numeric keys are counted at 8 bytes each, three times over to allow for
+            the copies made while building the sorted array.
+    :param batch_size {Integer}:
+            number of child rows checked at a time (default = 50000)
+    :param partitions {Integer}:
+            number of temporary files used when spilling (default = 16)
+    :return named tuple (child_rows, null_keys, orphan_rows, orphans, sample_oids, spilled).
+            orphans is a dictionary of orphan key: number of child rows,
+            sample_oids a dictionary of orphan key: list of child OIDs.
+    """
+    import itertools
+    child_key = child_key or parent_key
+    numeric_types = ('SmallInteger', 'Integer', 'Single', 'Double', 'OID')
+    numeric = (TableObj(parent_table).field_dict[parent_key]['type'] in numeric_types and
+               TableObj(child_table).field_dict[child_key]['type'] in numeric_types)
+    result = IntegrityResult(0, 0, 0, {}, {}, False)
+
+    if numeric:
+        parent_keys = _NumericKeys(batch_size)
+    else:
+        parent_keys = _TextKeys()
+    with arcpy.da.SearchCursor(parent_table, parent_key) as rows:
+        for row in rows:
+            if row[0] is None:
+                continue
+            parent_keys.add(row[0])
+            if parent_keys.nbytes > memory_budget:
+                # hand the keys read so far and the rest of the cursor to the partitions
+                remaining = (row[0] for row in rows if row[0] is not None)
+                output_msg("Parent keys exceed the memory budget, spilling to disk")
+                return _partition_integrity(itertools.chain(parent_keys.keys(), remaining), child_table, child_key,
+                                            sample_size, partitions, batch_size)
+
+    parent_keys = parent_keys.lookup()
+    for keys, oids in _key_batches(child_table, child_key, batch_size):
+        result = _check_keys(result, parent_keys, keys, oids, sample_size)
+    return result
+
+
+class _NumericKeys(object):
+    """numeric keys held in chunks of a numpy array, each chunk de-duplicated when full"""
+    def __init__(self, chunk_size=50000):
+        import numpy
+        self.chunks = []
+        self.buffer = numpy.empty(chunk_size, dtype=numpy.float64)
+        self.count = 0
+        self.held = 0
+
+    @property
+    def nbytes(self):
+        # the chunks, their concatenation and the sorted unique copy can exist together
+        return 3 * (self.held + self.buffer.nbytes)
+
+    def add(self, key):
+        import numpy
+        self.buffer[self.count] = key
+        self.count += 1
+        if self.count == len(self.buffer):
+            chunk = numpy.unique(self.buffer)
+            self.chunks.append(chunk)
+            self.held += chunk.nbytes
+            self.count = 0
+
+    def keys(self):
+        for chunk in self.chunks + [self.buffer[:self.count]]:
+            for key in chunk.tolist():
+                yield key
+
+    def lookup(self):
+        """:return sorted numpy array of the unique keys"""
+        import numpy
+        keys = numpy.unique(numpy.concatenate(self.chunks + [self.buffer[:self.count]]))
+        self.chunks = []
+        return keys
+
+
+class _TextKeys(object):
+    """keys held in a set, counting the size of the key objects and the set"""
+    def __init__(self):
+        import sys
+        self.set = set()
+        self.key_bytes = 0
+        self.set_bytes = sys.getsizeof(self.set)
+
+    @property
+    def nbytes(self):
+        return self.key_bytes + self.set_bytes
+
+    def add(self, key):
+        import sys
+        if key not in self.set:
+            self.set.add(key)
+            self.key_bytes += sys.getsizeof(key)
+            if len(self.set) % 1024 == 0:
+                self.set_bytes = sys.getsizeof(self.set)
+
+    def keys(self):
+        return iter(self.set)
+
+    def lookup(self):
+        return self.set
+
+
+def _key_batches(table, key_field, batch_size):
+    """Yield (keys, oids) lists for each batch of rows in a table"""
+    keys = []
+    oids = []
+    with arcpy.da.SearchCursor(table, [key_field, 'OID@']) as rows:
+        for key, oid in rows:
+            keys.append(key)
+            oids.append(oid)
+            if len(keys) == batch_size:
+                yield keys, oids
+                keys = []
+                oids = []
+    if keys:
+        yield keys, oids
+
+
+def _check_keys(result, parent_keys, keys, oids, sample_size):
+    """Add the orphans in a batch of child keys to an IntegrityResult.
+    parent_keys is a sorted numpy array or a set."""
+    child_rows, null_keys, orphan_rows, orphans, sample_oids, spilled = result
+    child_rows += len(keys)
+    if hasattr(parent_keys, 'searchsorted'):
+        import numpy
+        values = numpy.array([numpy.nan if k is None else k for k in keys], dtype=numpy.float64)
+        nulls = numpy.isnan(values)
+        if len(parent_keys):
+            idx = numpy.minimum(parent_keys.searchsorted(values), len(parent_keys) - 1)
+            found = parent_keys[idx] == values
+        else:
+            found = numpy.zeros(len(values), dtype=bool)
+        null_keys += int(nulls.sum())
+        missing = numpy.flatnonzero(~found & ~nulls).tolist()
+    else:
+        null_keys += sum(1 for k in keys if k is None)
+        missing = [i for i, k in enumerate(keys) if k is not None and k not in parent_keys]
+    for i in missing:
+        key = keys[i]
+        orphans[key] = orphans.get(key, 0) + 1
+        samples = sample_oids.setdefault(key, [])
+        if len(samples) < sample_size:
+            samples.append(oids[i])
+    orphan_rows += len(missing)
+    return IntegrityResult(child_rows, null_keys, orphan_rows, orphans, sample_oids, spilled)
+
+
+def _partition_integrity(parent_keys, child_table, child_key, sample_size, partitions, batch_size=50000):
+    """Check child keys against parent keys one hash partition at a time"""
+    import itertools
+    import shutil
+    import tempfile
+    counts = {'rows': 0, 'nulls': 0}
+
+    def child_pairs():
+        with arcpy.da.SearchCursor(child_table, [child_key, 'OID@']) as rows:
+            for key, oid in rows:
+                counts['rows'] += 1
+                if key is None:
+                    counts['nulls'] += 1
+                else:
+                    yield key, oid
+
+    folder = tempfile.mkdtemp(prefix='arc_utils_')
+    try:
+        parent_paths = _partition_to_disk(((key, None) for key in parent_keys), folder, 'parent', partitions)
+        child_paths = _partition_to_disk(child_pairs(), folder, 'child', partitions)
+        result = IntegrityResult(0, counts['nulls'], 0, {}, {}, True)
+        for parent_path, child_path in zip(parent_paths, child_paths):
+            keys = set(key for key, value in _read_partition(parent_path))
+            pairs = _read_partition(child_path)
+            while True:
+                batch = list(itertools.islice(pairs, batch_size))
+                if not batch:
+                    break
+                result = _check_keys(result, keys, [k for k, oid in batch], [oid for k, oid in batch], sample_size)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return result._replace(child_rows=counts['rows'])
+
+
 def import_schema_to_fc(csv_file, fc_name):
     """convert csv schema from report_fields_to_csv_schema
     to a featureclass"""
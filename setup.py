@@ -40,5 +40,8 @@ setup(
         #'Programming Language :: Python :: 3.3',
         #'Programming Language :: Python :: 3.4',
     ],
-    packages=find_packages()
+    packages=find_packages(),
+    entry_points={
+        'console_scripts': ['arc_utils=arc_utils.cli:main'],
+    },
     )
\ No newline at end of file
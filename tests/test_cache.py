@@ -0,0 +1,54 @@
+from arc_utils import cache
+from arc_utils import table
+
+
+def test_result_cache(testdata2):
+    # repeated calls are served from the cache
+    result_cache = cache.ResultCache(max_entries=2)
+    tbl = table.TableObj(testdata2.fc1, cache=result_cache)
+    first = tbl.get_field_value_set('ftext')
+    assert tbl.get_field_value_set('ftext') == first
+    stats = result_cache.stats()
+    assert stats.misses == 1
+    assert stats.hits == 1
+    # least recently used results are evicted
+    tbl.get_max_field_value('fint')
+    tbl.get_max_field_value_length('fint')
+    stats = result_cache.stats()
+    assert stats.entries == 2
+    assert stats.evictions == 1
+
+
+def test_result_cache_invalidation(testdata2):
+    # edit a copy so the shared test featureclasses are unchanged
+    fc = testdata2.fc2 + '_cache'
+    table.arcpy.CopyFeatures_management(testdata2.fc2, fc)
+    result_cache = cache.ResultCache(signal_ttl=0)
+    tbl = table.TableObj(fc, cache=result_cache)
+    assert tbl.get_max_field_value('fint') == 10
+    with table.arcpy.da.InsertCursor(fc, ['fint']) as cursor:
+        cursor.insertRow([11])
+    assert tbl.get_max_field_value('fint') == 11
+    assert result_cache.stats().invalidations == 1
+    table.arcpy.Delete_management(fc)
+
+
+def test_result_cache_signal_ttl(testdata2):
+    # the change signal is reused within signal_ttl seconds
+    result_cache = cache.ResultCache(signal_ttl=60)
+    signal = result_cache.signal(testdata2.fc1)
+    assert result_cache.signal(testdata2.fc1) is signal
+    result_cache.invalidate(testdata2.fc1)
+    assert result_cache.signal(testdata2.fc1) == signal
+
+
+def test_result_cache_domain_change(testdata2):
+    # a domain edit is seen although the table hasn't changed
+    result_cache = cache.ResultCache(signal_ttl=60)
+    tbl = table.TableObj(testdata2.fc1, cache=result_cache)
+    assert 'val02' in tbl.compare_field_values_to_domain('ftext', testdata2.gdb, 'ftext_coded').unmatched
+    table.arcpy.AddCodedValueToDomain_management(testdata2.gdb, 'ftext_coded', 'val02', 'val02')
+    try:
+        assert 'val02' in tbl.compare_field_values_to_domain('ftext', testdata2.gdb, 'ftext_coded').match
+    finally:
+        table.arcpy.DeleteCodedValueFromDomain_management(testdata2.gdb, 'ftext_coded', 'val02')
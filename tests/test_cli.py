@@ -0,0 +1,45 @@
+import json
+
+from arc_utils import cli
+
+
+def test_plan_jobs():
+    operations = [{"op": "value_set", "table": "a", "field": "f1"},
+                  {"op": "schema_diff", "table": "a", "other": "b"},
+                  {"op": "max", "table": "a", "field": "f2"},
+                  {"op": "max", "table": "b", "field": "f1"},
+                  {"op": "domain_check", "table": "a", "field": "f1"},
+                  {"op": "unknown"}]
+    steps, errors = cli.plan_jobs(operations)
+    assert [(kind, name, [i for i, o in ops]) for kind, name, ops in steps] == [
+        ("scan", "a", [0, 2]), ("scan", "b", [3]), ("schema_diff", "a", [1])]
+    assert sorted(errors) == [4, 5]
+
+
+def test_plan_jobs_write_barrier():
+    # scans are not moved across an operation that writes output
+    operations = [{"op": "max", "table": "a", "field": "f1"},
+                  {"op": "export_domains", "gdb": "g", "workspace": "g"},
+                  {"op": "value_set", "table": "a", "field": "f1"},
+                  {"op": "max", "table": "a", "field": "f2"}]
+    steps, errors = cli.plan_jobs(operations)
+    assert [(kind, name, [i for i, o in ops]) for kind, name, ops in steps] == [
+        ("scan", "a", [0]), ("export_domains", "g", [1]), ("scan", "a", [2, 3])]
+    assert errors == {}
+
+
+def test_run_job_file(testdata2, tmpdir):
+    job_file = tmpdir.join('job.json')
+    output = tmpdir.join('results.json')
+    job_file.write(json.dumps({"operations": [
+        {"op": "value_set", "table": testdata2.fc1, "field": "ftext"},
+        {"op": "max", "table": testdata2.fc1, "field": "fint"},
+        {"op": "domain_check", "table": testdata2.fc1, "field": "ftext",
+         "gdb": testdata2.gdb, "domain": "ftext_coded"},
+        {"op": "schema_diff", "table": testdata2.fc1, "other": testdata2.fc2}]}))
+    assert cli.main([str(job_file), '-o', str(output), '-q']) == 0
+    results = json.loads(output.read())
+    assert results[0]["result"] == [u'NULL', u'val02', u'val1', u'val2']
+    assert results[1]["result"] == 10
+    assert results[2]["result"]["unmatched"] == [u'NULL']
+    assert u' ftext field same in both' in results[3]["result"]
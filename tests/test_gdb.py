@@ -1,3 +1,14 @@
 from arc_utils import gdb
 
 testgdb = r"C:\Temp\scriptTesting\domain_test.gdb"
+
+
+def test_gdb_catalog(testdata2):
+    cat = gdb.GdbCatalog(testdata2.gdb)
+    assert sorted(cat.tables) == [u'test_fc', u'test_fc2']
+    assert sorted(cat.tables_with_field('FTEXT')) == [u'test_fc', u'test_fc2']
+    assert [f.table for f in cat.fields_with_domain('fint_range')] == cat.tables_with_field('fint')
+    assert all(f.type == u'SmallInteger' for f in cat.fields_of_type('SmallInteger'))
+    assert cat.unused_domains() == []
+    assert cat.field_dict('test_fc')['OBJECTID']['required'] == True
+    assert len(cat) == 8
@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from arc_utils import server
+
+
+@pytest.fixture(scope='module')
+def query_server():
+    qs = server.QueryServer(port=0)
+    thread = threading.Thread(target=qs.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield qs
+    qs.shutdown()
+
+
+def test_query_server(query_server, testdata2):
+    host, port = query_server.address
+    with server.QueryClient(host, port) as client:
+        values = client.call('table.get_field_value_set', table=testdata2.fc1, field='ftext')
+        assert values == [u'NULL', u'val02', u'val1', u'val2']
+        assert client.call('table.get_max_field_value', table=testdata2.fc1, field='fint') == 10
+        assert client.call('table.get_field_value_set', table=testdata2.fc1, field='ftext') == values
+        stats = client.call('server.stats')
+        assert stats['tables'] == 1
+        assert stats['cache']['hits'] == 1
+        result = client.call('compare_schema', fc1=testdata2.fc1, fc2=testdata2.fc2)
+        assert u' ftext field same in both' in result
+        with pytest.raises(server.QueryError):
+            client.call('table.__init__', table=testdata2.fc1)
+
+
+def test_query_server_idle_connections(query_server, testdata2):
+    # several open connections, an idle connection doesn't hold the worker
+    host, port = query_server.address
+    clients = [server.QueryClient(host, port, timeout=30) for i in range(4)]
+    try:
+        for client in clients:
+            client.connect()
+        for client in reversed(clients):
+            assert client.call('table.get_max_field_value', table=testdata2.fc1, field='fint') == 10
+    finally:
+        for client in clients:
+            client.close()
+
+
+def test_query_server_schema_change(query_server, testdata2):
+    # a field added after the table is kept is seen by the next request
+    fc = testdata2.fc2 + '_server'
+    server.arcpy.CopyFeatures_management(testdata2.fc2, fc)
+    host, port = query_server.address
+    with server.QueryClient(host, port) as client:
+        assert 'fnew' not in client.call('table.field_dict', table=fc)
+        server.arcpy.AddField_management(fc, 'fnew', 'LONG')
+        assert 'fnew' in client.call('table.field_dict', table=fc)
+    server.arcpy.Delete_management(fc)
+
+
+def test_query_server_token(testdata2, tmpdir):
+    with pytest.raises(ValueError):
+        server.QueryServer(host='0.0.0.0', port=0)
+    qs = server.QueryServer(port=0, token='secret')
+    thread = threading.Thread(target=qs.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        host, port = qs.address
+        with server.QueryClient(host, port) as client:
+            with pytest.raises(server.QueryError):
+                client.call('server.stats')
+        with server.QueryClient(host, port, token='secret') as client:
+            assert client.call('server.stats')['requests'] == 1
+            assert client.call('table.export_schema_to_csv', table=testdata2.fc1, path=str(tmpdir))
+    finally:
+        qs.shutdown()
+
+
+def test_query_server_write_methods(query_server, testdata2, tmpdir):
+    # without a token methods that write files are refused
+    host, port = query_server.address
+    with server.QueryClient(host, port) as client:
+        with pytest.raises(server.QueryError):
+            client.call('table.export_schema_to_csv', table=testdata2.fc1, path=str(tmpdir))
+        with pytest.raises(server.QueryError):
+            client.call('gdb.report_all_fc_as_text', geodatabase=testdata2.gdb,
+                        output_file=str(tmpdir.join('report.txt')))
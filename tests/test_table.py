@@ -1,4 +1,5 @@
 from arc_utils import table
+import pytest
 import collections
 import os
 
@@ -51,3 +52,192 @@ def test_table_fc_methods(testdata):
     # test non-object table methods
     #table.compare_schema(testdata.fc, testdata.fc2)
     pass
+
+
+def test_tableobj_geometry_stats(testdata2):
+    # test geometry profiling of a point featureclass
+    tbl = table.TableObj(testdata2.fc1)
+    stats = tbl.get_geometry_stats(heaviest=3)
+    assert stats.count == 11
+    assert stats.null_count == 0
+    assert stats.empty_count == 0
+    assert stats.vertex_count.max == 1
+    assert len(stats.heaviest) == 3
+    xmin, ymin, xmax, ymax = stats.extent
+    assert -122.4 < xmin <= xmax < -122.2
+    assert 47.5 < ymin <= ymax < 47.7
+
+
+def test_tableobj_right_size_schema(testdata2, tmpdir):
+    # test schema right-sizing proposals
+    tbl = table.TableObj(testdata2.fc1)
+    advice = tbl.right_size_schema(str(tmpdir))
+    assert advice.row_count == 11
+    assert os.path.exists(advice.report)
+    changes = dict((c.field, c) for c in advice.changes)
+    assert changes['ftext'].new_length == 10
+    assert changes['ftext'].bytes_saved == (20 - 10) * 11
+    assert 'fint' not in changes
+
+
+def test_right_size_schema_numeric_headroom(testdata2, tmpdir):
+    # an Integer near the SmallInteger limit keeps room to grow,
+    # a Double of whole numbers only becomes an integer when asked
+    tbl_path = os.path.join(testdata2.gdb, 'test_right_size')
+    table.arcpy.CreateTable_management(testdata2.gdb, 'test_right_size')
+    table.arcpy.AddField_management(tbl_path, 'fid', 'LONG')
+    table.arcpy.AddField_management(tbl_path, 'fwhole', 'DOUBLE')
+    with table.arcpy.da.InsertCursor(tbl_path, ['fid', 'fwhole']) as cursor:
+        for i in range(1, 101):
+            cursor.insertRow([31900 + i, float(i)])
+    tbl = table.TableObj(tbl_path)
+    changes = dict((c.field, c) for c in tbl.right_size_schema(str(tmpdir)).changes)
+    assert 'fid' not in changes
+    assert changes['fwhole'].new_type == 'Single'
+    changes = dict((c.field, c) for c in tbl.right_size_schema(str(tmpdir), integral_floats=True).changes)
+    assert changes['fwhole'].new_type == 'SmallInteger'
+    assert 'fid' in dict((c.field, c) for c in tbl.right_size_schema(str(tmpdir), headroom=0).changes)
+    table.arcpy.Delete_management(tbl_path)
+
+
+def test_tableobj_sampled_statistics(testdata2):
+    # a sample of every page should match the full table
+    tbl = table.TableObj(testdata2.fc1)
+    sample = table.Sample(1.0, page_size=4)
+    result = tbl.get_field_value_set('ftext', sample=sample)
+    assert result.value == tbl.get_field_value_set('ftext')
+    assert result.rows_read == 11
+    assert result.total_rows == 11
+    assert result.fraction == 1.0
+    assert result.estimates['distinct_estimate'] >= 4
+    assert result.estimates['pages_read'] == 3
+    result = tbl.get_max_field_value('fint', sample=sample)
+    assert result.value == 10
+    # the bounds count the 3 pages read (OIDs 1-4, 5-8, 9-11), not the 11 rows
+    assert result.estimates['above_max_rate_95'] == pytest.approx(1 - 0.05 ** (1 / 3.0))
+    result = tbl.compare_field_values_to_domain('ftext', testdata2.gdb, "ftext_coded", sample=sample)
+    assert result.value.unmatched == ['NULL']
+    assert result.estimates['outside_rows'] == 1
+    assert result.estimates['outside_pages'] == 1
+    assert result.estimates['outside_rate_95'] == pytest.approx(table._upper_rate_95(1, 3))
+    assert table.Sample(0.5, page_size=2, seed=1).pages(6) == table.Sample(0.5, page_size=2, seed=1).pages(6)
+
+
+def test_diff_table_data(testdata2):
+    # identical attributes in both test featureclasses
+    result = table.diff_table_data(testdata2.fc1, testdata2.fc2, 'OBJECTID', ['ftext', 'fint'])
+    assert result.inserted == []
+    assert result.deleted == []
+    assert result.modified == []
+    result = table.diff_table_data(testdata2.fc1, testdata2.fc2, 'OBJECTID', geometry=True, method='partition')
+    assert result.inserted == []
+    assert result.deleted == []
+
+
+def test_analyze_tables(testdata2):
+    # results stream back per job, errors are captured
+    jobs = [(testdata2.fc1, ['ftext', 'fint'], ['get_field_value_set', 'get_max_field_value']),
+            (testdata2.fc2, 'fint', ['get_max_field_value']),
+            (testdata2.fc2, 'fint', ['not_a_statistic'])]
+    results = list(table.analyze_tables(jobs, max_workers=2, connections_per_workspace=1))
+    assert len(results) == 3
+    by_table = dict((r.job.table, r) for r in results if r.error is None)
+    assert by_table[testdata2.fc1].results[('get_max_field_value', 'fint')] == 10
+    assert by_table[testdata2.fc1].results[('get_field_value_set', 'ftext')] == set([u'NULL', 'val02', 'val1', 'val2'])
+    assert by_table[testdata2.fc2].results[('get_max_field_value', 'fint')] == 10
+    errors = [r for r in results if r.error is not None]
+    assert len(errors) == 1
+    assert 'not_a_statistic' in errors[0].error
+
+
+def test_analyze_tables_captures_statistic_errors(testdata2):
+    # get_field_value_set prints errors when called directly, jobs capture them
+    jobs = [(testdata2.fc1, 'no_such_field', ['get_field_value_set'])]
+    results = list(table.analyze_tables(jobs))
+    assert len(results) == 1
+    assert results[0].error is not None
+    assert results[0].results == {}
+
+
+def test_bulk_load(testdata2, tmpdir):
+    # invalid values reject the row, valid rows are appended
+    csv_path = tmpdir.join('load.csv')
+    csv_path.write('ftext,fint,x,y\nval1,3,-122.3,47.6\nval2,,-122.3,47.6\nval3,abc,-122.3,47.6\n'
+                   'this value is far too long,1,-122.3,47.6\nval1,99999,-122.3,47.6\n')
+    # load into a copy so the shared test featureclasses are unchanged
+    fc = testdata2.fc2 + '_load'
+    table.arcpy.CopyFeatures_management(testdata2.fc2, fc)
+    tbl = table.TableObj(fc)
+    before = tbl._row_count()
+    result = table.bulk_load(str(csv_path), fc, xy_fields=('x', 'y'), batch_size=2)
+    assert result.rows_read == 5
+    assert result.rows_loaded == 2
+    assert result.rows_rejected == 3
+    assert result.rejected_rows == [2, 3, 4]
+    assert tbl._row_count() == before + 2
+    table.arcpy.Delete_management(fc)
+
+
+def test_check_referential_integrity(testdata2):
+    # every fint and ftext value in fc1 exists in fc2
+    result = table.check_referential_integrity(testdata2.fc2, 'fint', testdata2.fc1)
+    assert result.child_rows == 11
+    assert result.null_keys == 2
+    assert result.orphans == {}
+    result = table.check_referential_integrity(testdata2.fc2, 'ftext', testdata2.fc1, memory_budget=0)
+    assert result.spilled
+    assert result.null_keys == 1
+    assert result.orphans == {}
+    result = table.check_referential_integrity(testdata2.fc1, 'OBJECTID', testdata2.fc1, 'fint', sample_size=1)
+    assert result.orphans == {}
+
+
+def test_tableobj_spatial_duplicates(testdata2):
+    # a new featureclass of known points: an exact pair, a pair 0.5 apart,
+    # a single point and a chain of three points 0.6 apart
+    fc = os.path.join(testdata2.gdb, 'test_fc_dupes')
+    table.arcpy.CreateFeatureclass_management(testdata2.gdb, 'test_fc_dupes', 'POINT',
+                                              spatial_reference=table.arcpy.SpatialReference(4326))
+    points = [(0, 0), (0, 0), (10, 10), (10.5, 10), (20, 20), (30, 30), (30.6, 30), (31.2, 30)]
+    with table.arcpy.da.InsertCursor(fc, ['SHAPE@XY']) as cursor:
+        for point in points:
+            cursor.insertRow([point])
+    tbl = table.TableObj(fc)
+    assert tbl.find_spatial_duplicates() == [[1, 2]]
+    assert tbl.find_spatial_duplicates(tolerance=1.0) == [[1, 2], [3, 4], [6, 7, 8]]
+    assert tbl.find_spatial_duplicates(tolerance=0.55) == [[1, 2], [3, 4]]
+    table.arcpy.Delete_management(fc)
+
+
+def test_tableobj_spatial_duplicates_collinear(testdata2):
+    # 1000 points sharing one x, 2 apart in y, and a point 0.5 from the first
+    fc = os.path.join(testdata2.gdb, 'test_fc_column')
+    # no spatial reference, so y isn't limited to latitudes
+    table.arcpy.CreateFeatureclass_management(testdata2.gdb, 'test_fc_column', 'POINT')
+    with table.arcpy.da.InsertCursor(fc, ['SHAPE@XY']) as cursor:
+        for i in range(1000):
+            cursor.insertRow([(0, 2 * i)])
+        cursor.insertRow([(0, 0.5)])
+    tbl = table.TableObj(fc)
+    assert tbl.find_spatial_duplicates() == []
+    assert tbl.find_spatial_duplicates(tolerance=1.0) == [[1, 1001]]
+    table.arcpy.Delete_management(fc)
+
+
+def test_tableobj_field_statistics(testdata2):
+    # one cursor pass gives the same results as the single statistic methods
+    tbl = table.TableObj(testdata2.fc1)
+    stats = tbl.get_field_statistics([('max', 'ftext'), ('longest', 'ftext'), ('max_length', 'fint'),
+                                      ('value_set', 'ftext'), ('duplicates', 'fint')])
+    assert stats[('max', 'ftext')] == tbl.get_max_field_value('ftext') == 'val2'
+    assert stats[('longest', 'ftext')] == tbl.get_max_field_value('ftext', True) == 'val02'
+    assert stats[('max_length', 'fint')] == tbl.get_max_field_value_length('fint') == 2
+    assert stats[('value_set', 'ftext')] == tbl.get_field_value_set('ftext')
+    assert stats[('duplicates', 'fint')] == tbl.find_duplicate_field_values('fint')
+
+
+def test_diff_table_data_duplicate_keys(testdata2):
+    # ftext repeats values, so it can't be used as a key by either method
+    for method in ('auto', 'partition'):
+        with pytest.raises(ValueError):
+            table.diff_table_data(testdata2.fc1, testdata2.fc2, 'ftext', ['fint'], method=method)